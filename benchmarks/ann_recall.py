@@ -0,0 +1,39 @@
+from helpers import io_helper
+from embeddings import text_embeddings
+from embeddings import ann_index
+import numpy as np
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description='Reports the recall@num_cand and the speed of the approximate nearest-neighbour index against the exact candidate search. Run from the repository root as: python -m benchmarks.ann_recall embs index')
+parser.add_argument('embs', help='Path to the file containing pre-trained word embeddings (textual or binary format)')
+parser.add_argument('index', help='Path to the index built with build_ann_index.py')
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the (textual) embeddings file to read (default 200000)', default = 200000)
+parser.add_argument('-nc', '--numcands', type=int, help='Number of candidates retrieved per query word (default 10)', default = 10)
+parser.add_argument('-nq', '--numqueries', type=int, help='Number of randomly sampled query words (default 1000)', default = 1000)
+parser.add_argument('-np', '--nprobes', help='Comma-separated list of nprobe values to evaluate (default 1,2,4,8,16,32)', default = "1,2,4,8,16,32")
+
+args = parser.parse_args()
+
+t_embeddings = text_embeddings.Embeddings()
+if io_helper.is_binary_embeddings(args.embs):
+	t_embeddings.load_embeddings_binary(args.embs, language = 'default')
+else:
+	t_embeddings.load_embeddings(args.embs, args.limit, language = 'default', skip_first_line = True, normalize = True)
+embs = t_embeddings.lang_embeddings['default']
+index = ann_index.IVFIndex.load(args.index)
+
+rng = np.random.RandomState(42)
+queries = np.asarray(embs[rng.choice(embs.shape[0], min(args.numqueries, embs.shape[0]), replace = False)])
+
+start = time.perf_counter()
+exact = [t_embeddings.top_k_dot(q, 'default', num = args.numcands, without_first = True)[0][0] for q in queries]
+exact_time = time.perf_counter() - start
+print("Exact search: " + str(round(len(queries) / exact_time, 1)) + " queries/sec")
+
+for nprobe in [int(x) for x in args.nprobes.split(",")]:
+	start = time.perf_counter()
+	approx = [index.search(q, embs, args.numcands + 1, nprobe = nprobe)[0][0][1:] for q in queries]
+	approx_time = time.perf_counter() - start
+	recall = np.mean([len(set(e).intersection(a)) / float(len(e)) for e, a in zip(exact, approx)])
+	print("nprobe = " + str(nprobe) + ": recall@" + str(args.numcands) + " = " + str(round(recall, 4)) + ", " + str(round(len(queries) / approx_time, 1)) + " queries/sec (speed-up " + str(round(exact_time / approx_time, 2)) + "x)")
@@ -0,0 +1,58 @@
+from helpers import io_helper
+from helpers import string_helper
+import argparse
+import random
+import time
+
+parser = argparse.ArgumentParser(description='Checks (with assertions on fixed word pairs and on sampled pairs) the morphological-variant filter used in candidate filtering (string_helper.is_morphological_variant) against the original filtering based on longest_common_subsequence, and compares their speed. Run from the repository root as: python -m benchmarks.lcs_filter')
+parser.add_argument('-wf', '--wordfreqs', help='Path to the word frequencies file from which the word pairs are sampled (default resources/en/unigram-freqs-en.txt)', default = 'resources/en/unigram-freqs-en.txt')
+parser.add_argument('-n', '--numpairs', type=int, help='Number of (target, candidate) word pairs (default 200000)', default = 200000)
+
+args = parser.parse_args()
+
+def reference_is_variant(target, c):
+	if c in target or target in c:
+		return True
+	lcses = string_helper.longest_common_subsequence(c, target)
+	if len(lcses) > 0:
+		lcs = lcses.pop()
+		if len(target) >= 6 and len(c) >= 6 and len(lcs) >= (min(len(c), len(target)) - 3):
+			return True
+	return False
+
+# fixed pairs covering the cases of the rule: containment, short words, shared substrings just long enough and one character too short
+fixed_words = ["nation", "national", "nationality", "internationally", "act", "action", "reaction", "education", "educational", "reeducation", "organize", "organisation", "organization", "simplify", "simplification", "simple", "complexity", "complicated", "happiness", "unhappy", "governance", "government", "governor", "walked", "walking", "stalking", "abcdefgh", "xbcdefgy", "xbcdeyyy"]
+fixed_pairs = [(t, c) for t in fixed_words for c in fixed_words if t != c]
+assert [string_helper.filter_morphological_variants(t, [c for t2, c in fixed_pairs if t2 == t]) for t in fixed_words] == [[c for t2, c in fixed_pairs if t2 == t and not reference_is_variant(t, c)] for t in fixed_words], "The morphological-variant filter disagrees with the original filter on the fixed word pairs"
+print("Fixed word pairs agreeing with the original filter: " + str(len(fixed_pairs)) + "/" + str(len(fixed_pairs)))
+
+words = [l.split()[0] for l in io_helper.load_lines(args.wordfreqs)]
+rnd = random.Random(42)
+pairs = []
+for i in range(args.numpairs):
+	target = rnd.choice(words)
+	# half of the candidates share a prefix with the target, so that the pairs include many (near) variants
+	candidate = rnd.choice(words) if i % 2 == 0 else target[: rnd.randint(1, len(target))] + rnd.choice(words)[rnd.randint(0, 3):]
+	pairs.append((target, candidate))
+
+
+start = time.perf_counter()
+reference = [reference_is_variant(t, c) for t, c in pairs]
+time_reference = time.perf_counter() - start
+
+string_helper.is_morphological_variant.cache_clear()
+start = time.perf_counter()
+fast = [string_helper.is_morphological_variant(t, c) for t, c in pairs]
+time_fast = time.perf_counter() - start
+
+start = time.perf_counter()
+fast_cached = [string_helper.is_morphological_variant(t, c) for t, c in pairs]
+time_cached = time.perf_counter() - start
+
+differing = sum(1 for r, f, fc in zip(reference, fast, fast_cached) if r != f or r != fc)
+print("Variants: " + str(sum(reference)) + "/" + str(len(pairs)) + ", decisions differing from the original filter: " + str(differing))
+print("Original filter: " + str(round(1e6 * time_reference / len(pairs), 2)) + " microseconds per pair")
+print("Fast filter: " + str(round(1e6 * time_fast / len(pairs), 2)) + " microseconds per pair (speed-up " + str(round(time_reference / time_fast, 1)) + "x), memoised: " + str(round(1e6 * time_cached / len(pairs), 2)) + " microseconds per pair")
+
+if differing > 0:
+	exit(code = 1)
@@ -0,0 +1,69 @@
+from helpers import io_helper
+import numpy as np
+import argparse
+import asyncio
+import json
+import random
+import time
+
+parser = argparse.ArgumentParser(description='Load generator for the simplification server (server.py): sends simplification requests over a number of concurrent connections and reports the throughput and the latency percentiles. Run from the repository root as: python -m benchmarks.load_generator')
+parser.add_argument('-t', '--texts', help='Path to a file with texts to be sent (one text per line). If not provided, random texts are generated from the words of the frequency file (option -wf).')
+parser.add_argument('-wf', '--wordfreqs', help='Path to the word frequencies file used for generating random texts (default resources/en/unigram-freqs-en.txt)', default = 'resources/en/unigram-freqs-en.txt')
+parser.add_argument('--host', help='Host of the server (default 127.0.0.1)', default = '127.0.0.1')
+parser.add_argument('--port', type=int, help='Port of the server (default 8080)', default = 8080)
+parser.add_argument('--socket', help='Path to the Unix socket of the server (instead of the host and port)')
+parser.add_argument('-c', '--concurrency', type=int, help='Number of concurrent connections (default 16)', default = 16)
+parser.add_argument('-n', '--numrequests', type=int, help='Total number of requests (default 2000)', default = 2000)
+parser.add_argument('-tpr', '--textsperrequest', type=int, help='Number of texts per request (default 1)', default = 1)
+parser.add_argument('-p', '--parameters', help='Parameter overrides sent with each request, as a JSON object (e.g., \'{"similarity_threshold": 0.6}\')')
+
+args = parser.parse_args()
+
+if args.texts:
+	texts = [l for l in io_helper.load_lines(args.texts) if l != ""]
+else:
+	words = [l.split()[0] for l in io_helper.load_lines(args.wordfreqs)[:50000]]
+	rnd = random.Random(42)
+	texts = [" ".join(words[int(rnd.paretovariate(0.7)) % len(words)] for i in range(rnd.randint(10, 40))) for j in range(1000)]
+
+async def send_requests(worker, latencies, errors):
+	if args.socket:
+		reader, writer = await asyncio.open_unix_connection(args.socket)
+	else:
+		reader, writer = await asyncio.open_connection(args.host, args.port)
+	rnd = random.Random(worker)
+	for r in range(worker, args.numrequests, args.concurrency):
+		request = { "texts" : [rnd.choice(texts) for i in range(args.textsperrequest)] }
+		if args.parameters:
+			request["parameters"] = json.loads(args.parameters)
+		body = json.dumps(request).encode("utf8")
+		start = time.perf_counter()
+		writer.write(("POST /simplify HTTP/1.1\r\nHost: " + args.host + "\r\nContent-Type: application/json\r\nContent-Length: " + str(len(body)) + "\r\n\r\n").encode("latin-1") + body)
+		await writer.drain()
+		status = (await reader.readline()).decode("latin-1").split()
+		length = 0
+		while True:
+			line = await reader.readline()
+			if line in (b"\r\n", b"\n", b""):
+				break
+			name, _, value = line.decode("latin-1").partition(":")
+			if name.strip().lower() == "content-length":
+				length = int(value.strip())
+		await reader.readexactly(length)
+		latencies.append(time.perf_counter() - start)
+		if len(status) < 2 or status[1] != "200":
+			errors.append(status)
+	writer.close()
+
+async def run():
+	latencies = []
+	errors = []
+	start = time.perf_counter()
+	await asyncio.gather(*[send_requests(w, latencies, errors) for w in range(args.concurrency)])
+	return latencies, errors, time.perf_counter() - start
+
+latencies, errors, duration = asyncio.run(run())
+latencies = np.array(latencies) * 1000.0
+print("Requests: " + str(len(latencies)) + " (" + str(len(errors)) + " failed) in " + str(round(duration, 2)) + " seconds")
+print("Throughput: " + str(round(len(latencies) / duration, 1)) + " requests/sec, " + str(round(len(latencies) * args.textsperrequest / duration, 1)) + " texts/sec")
+print("Latency (ms): p50 = " + str(round(np.percentile(latencies, 50), 2)) + ", p90 = " + str(round(np.percentile(latencies, 90), 2)) + ", p99 = " + str(round(np.percentile(latencies, 99), 2)) + ", max = " + str(round(latencies.max(), 2)))
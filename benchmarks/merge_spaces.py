@@ -0,0 +1,51 @@
+from embeddings import text_embeddings
+import numpy as np
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description='Checks and times the merging of embedding spaces (Embeddings.merge_embedding_spaces), copied into one matrix and virtual, on synthetic spaces: the vectors, the similarities of words with identical vectors (which need to be 1.0) and the cross-lingual neighbours need to agree. Run from the repository root as: python -m benchmarks.merge_spaces')
+parser.add_argument('-v', '--vocabsize', type=int, help='Size of the vocabulary of each synthetic space (default 100000)', default = 100000)
+parser.add_argument('-dim', '--dimension', type=int, help='Embedding size of the synthetic spaces (default 100)', default = 100)
+parser.add_argument('-nq', '--numqueries', type=int, help='Number of query words of the cross-lingual search (default 200)', default = 200)
+
+args = parser.parse_args()
+
+rng = np.random.RandomState(42)
+t_embeddings = text_embeddings.Embeddings()
+languages = ["en", "it", "de"]
+shared = rng.normal(size = args.dimension).astype(np.float32)
+for lang in languages:
+	vectors = rng.normal(size = (args.vocabsize, args.dimension)).astype(np.float32)
+	# the first word of every language has the same vector
+	vectors[0] = shared
+	norms = np.linalg.norm(vectors, axis = 1)
+	t_embeddings.lang_embeddings[lang] = vectors / norms[:, np.newaxis]
+	t_embeddings.lang_emb_norms[lang] = norms
+	t_embeddings.lang_vocabularies[lang] = {lang + str(i) : i for i in range(args.vocabsize)}
+	t_embeddings.emb_sizes[lang] = args.dimension
+	t_embeddings.lang_normalized[lang] = True
+
+start = time.perf_counter()
+t_embeddings.merge_embedding_spaces(languages, args.dimension, merge_name = "merged")
+time_copied = time.perf_counter() - start
+start = time.perf_counter()
+t_embeddings.merge_embedding_spaces(languages, args.dimension, merge_name = "virtual", virtual = True)
+time_virtual = time.perf_counter() - start
+
+for name in ["merged", "virtual"]:
+	similarity = t_embeddings.word_similarity("en__en0", "it__it0", name, name)
+	assert abs(similarity - 1.0) < 1e-5, "Words with identical vectors have the similarity " + str(similarity) + " in the " + name + " space"
+assert np.allclose(t_embeddings.get_rows("merged", slice(None)), t_embeddings.get_rows("virtual", slice(None)))
+
+queries = t_embeddings.get_rows("merged", rng.choice(len(languages) * args.vocabsize, args.numqueries, replace = False))
+start = time.perf_counter()
+neighbours_copied = t_embeddings.most_similar_fast_cosine_batch(queries, "merged", num = 10)
+time_search_copied = time.perf_counter() - start
+start = time.perf_counter()
+neighbours_virtual = t_embeddings.most_similar_fast_cosine_batch(queries, "virtual", num = 10)
+time_search_virtual = time.perf_counter() - start
+assert neighbours_copied == neighbours_virtual, "The neighbours in the virtual space differ from those in the merged matrix"
+
+print("Merging (copied into one matrix): " + str(round(time_copied, 3)) + " s, " + str(round(t_embeddings.memory_usage("merged") / 1048576.0, 1)) + " MB")
+print("Merging (virtual): " + str(round(time_virtual, 3)) + " s, " + str(round(t_embeddings.memory_usage("virtual") / 1048576.0, 1)) + " MB")
+print("Cross-lingual search of " + str(args.numqueries) + " words: " + str(round(time_search_copied, 3)) + " s (copied), " + str(round(time_search_virtual, 3)) + " s (virtual)")
@@ -0,0 +1,177 @@
+from simplification import lightls
+from simplification import complexity
+from simplification import corpus
+from simplification import statistics
+from helpers import io_helper
+from embeddings import text_embeddings
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description='Benchmark of the simplification pipeline: times the separate stages (embedding loading, LightLS initialisation and the stages recorded by the run statistics of a simplification: target selection, candidate search, candidate filtering, ranking, output writing) and the end-to-end throughput on synthetic embedding spaces (built offline from the vocabularies of the bundled frequency lists) and synthetic or given corpora. Run from the repository root as: python -m benchmarks.pipeline -o results.json')
+parser.add_argument('-lg', '--languages', help='Comma-separated list of the bundled languages (resources/<language>) to benchmark (default en,it)', default = 'en,it')
+parser.add_argument('-v', '--vocabsize', type=int, help='Size of the vocabulary of the synthetic embedding spaces (default 50000)', default = 50000)
+parser.add_argument('-dim', '--dimension', type=int, help='Embedding size of the synthetic embedding spaces (default 100)', default = 100)
+parser.add_argument('-e', '--embs', help='Path to real pre-trained embeddings (textual or binary format) used instead of the synthetic space (only with a single language)')
+parser.add_argument('-d', '--datadir', help='Path to a directory with texts used instead of the synthetic corpus (only with a single language)')
+parser.add_argument('-nd', '--numdocs', type=int, help='Number of documents of the synthetic corpus (default 500)', default = 500)
+parser.add_argument('-dl', '--doclength', type=int, help='Number of tokens of each synthetic document (default 200)', default = 200)
+parser.add_argument('-o', '--output', help='Path to the JSON file into which the results are written')
+parser.add_argument('-b', '--baseline', help='Path to a JSON file with the results of a previous run (e.g., of another commit) to compare against')
+parser.add_argument('-t', '--tolerance', type=float, help='Relative slow-down of a stage (compared to the baseline) reported as a regression (default 0.2)', default = 0.2)
+
+args = parser.parse_args()
+
+parameters = {"complexity_drop_threshold" : 0.03, "num_cand" : 10, "similarity_threshold" : 0.55, "context_window_size" : 5, "complexity_threshold" : 0.2}
+
+def peak_rss_mb():
+	# on Linux, ru_maxrss is given in kilobytes
+	return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+def timed(timings, stage, function, *function_args):
+	start = time.perf_counter()
+	result = function(*function_args)
+	timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+	return result
+
+def synthetic_space(words, dimension, rng):
+	"""Unit-length vectors grouped around random centres, so that words have close neighbours (as in real spaces)."""
+	centres = rng.normal(size = (max(1, len(words) // 20), dimension)).astype(np.float32)
+	vectors = centres[rng.randint(len(centres), size = len(words))] + 0.6 * rng.normal(size = (len(words), dimension)).astype(np.float32)
+	return vectors / np.linalg.norm(vectors, axis = 1, keepdims = True)
+
+def synthetic_corpus(complexities, words, rng):
+	"""Documents sampled from the word distribution of the frequency list, with some capitalised and punctuated tokens."""
+	probabilities = complexities.frequencies[complexities.get_ids(words)].astype(np.float64)
+	probabilities /= probabilities.sum()
+	documents = []
+	for d in range(args.numdocs):
+		tokens = [words[i] for i in rng.choice(len(words), args.doclength, p = probabilities)]
+		for i in range(0, len(tokens), 17):
+			tokens[i] = tokens[i].capitalize()
+		for i in range(11, len(tokens), 13):
+			tokens[i] = tokens[i] + ","
+		documents.append(" ".join(tokens))
+	return documents
+
+def benchmark_language(language, workdir):
+	rng = np.random.RandomState(42)
+	timings = {}
+	resources_dir = os.path.join("resources", language)
+	complexities = timed(timings, "frequencies_load", complexity.ComplexityTable.load, os.path.join(resources_dir, "unigram-freqs-" + language + ".txt"))
+	stopwords = io_helper.load_lines(os.path.join(resources_dir, "stopwords-" + language + ".txt"))
+
+	if args.embs:
+		embs_path = args.embs
+	else:
+		words = complexities.words[:args.vocabsize]
+		vectors = synthetic_space(words, args.dimension, rng)
+		embs_path = os.path.join(workdir, language + ".vec")
+		with open(embs_path, "w", encoding = "utf8") as f:
+			f.write(str(len(words)) + " " + str(args.dimension) + "\n")
+			for w, v in zip(words, vectors):
+				f.write(w + " " + " ".join("%.6f" % x for x in v) + "\n")
+		t_embeddings = text_embeddings.Embeddings()
+		timed(timings, "embeddings_load_text", lambda: t_embeddings.load_embeddings(embs_path, args.vocabsize, language = language, skip_first_line = True, normalize = True))
+		embs_path = os.path.join(workdir, language + ".bin")
+		t_embeddings.inverse_vocabularies()
+		t_embeddings.store_embeddings_binary(embs_path, language)
+
+	t_embeddings = text_embeddings.Embeddings()
+	if io_helper.is_binary_embeddings(embs_path):
+		timed(timings, "embeddings_load_binary", lambda: t_embeddings.load_embeddings_binary(embs_path, language = "default", mmap = False))
+	else:
+		timed(timings, "embeddings_load_text", lambda: t_embeddings.load_embeddings(embs_path, 200000, language = "default", skip_first_line = True, normalize = True))
+	t_embeddings.inverse_vocabularies()
+
+	simplifier = timed(timings, "lightls_init", lightls.LightLS, t_embeddings, complexities, parameters, stopwords)
+
+	if args.datadir:
+		documents = [x[1] for x in io_helper.load_all_files(args.datadir)]
+	else:
+		vocabulary = t_embeddings.lang_vocabularies["default"]
+		documents = synthetic_corpus(complexities, [w for w in complexities.words[:args.vocabsize] if w in vocabulary], rng)
+	num_tokens = sum(len(d.split()) for d in documents)
+
+	# the stages are timed by the RunStatistics of the simplifier during a real (streamed, one document at a time, as in the corpus runs) simplification,
+	# without the candidate cache, so that the candidates of every target word are searched for
+	run_stats = statistics.RunStatistics()
+	staged = lightls.LightLS(t_embeddings, complexities, parameters, stopwords, statistics = run_stats)
+	t_embeddings.statistics = run_stats
+	with open(os.path.join(workdir, language + ".out"), "w", encoding = "utf8") as output, open(os.path.join(workdir, language + ".subs"), "w", encoding = "utf8") as subs_output:
+		corpus.simplify_stream(staged, ({ "text" : d } for d in documents), output, subs_output)
+	t_embeddings.statistics = None
+	timings.update(run_stats.timers)
+	num_targets = run_stats.counters.get("targets", 0)
+	num_replaced = run_stats.counters.get("substitutions", 0)
+
+	start = time.perf_counter()
+	for document in documents:
+		simplifier.simplify_text(document)
+	end_to_end = time.perf_counter() - start
+
+	start = time.perf_counter()
+	simplifier.simplify_batch(documents)
+	batched = time.perf_counter() - start
+
+	return {
+		"vocabulary_size" : len(t_embeddings.lang_vocabularies["default"]),
+		"dimension" : t_embeddings.emb_sizes["default"],
+		"documents" : len(documents),
+		"tokens" : num_tokens,
+		"targets" : num_targets,
+		"substitutions" : num_replaced,
+		"stages" : {s : round(timings[s], 4) for s in timings},
+		"end_to_end" : { "seconds" : round(end_to_end, 4), "tokens_per_sec" : round(num_tokens / end_to_end, 1), "documents_per_sec" : round(len(documents) / end_to_end, 1) },
+		"batched" : { "seconds" : round(batched, 4), "tokens_per_sec" : round(num_tokens / batched, 1), "documents_per_sec" : round(len(documents) / batched, 1) },
+		"peak_rss_mb" : peak_rss_mb()
+	}
+
+languages = args.languages.split(",")
+if (args.embs or args.datadir) and len(languages) > 1:
+	print("Error: Real embeddings or texts can be benchmarked only with a single language (option -lg).")
+	exit(code = 1)
+
+results = { "timestamp" : time.strftime('%Y-%m-%d %H:%M:%S'), "python" : platform.python_version(), "numpy" : np.__version__, "parameters" : parameters, "languages" : {} }
+workdir = tempfile.mkdtemp()
+try:
+	for language in languages:
+		print("Benchmarking language: " + language, flush = True)
+		res = benchmark_language(language, workdir)
+		results["languages"][language] = res
+		for stage in res["stages"]:
+			print("  " + stage + ": " + str(res["stages"][stage]) + " s")
+		print("  end-to-end: " + str(res["end_to_end"]["tokens_per_sec"]) + " tokens/sec, " + str(res["end_to_end"]["documents_per_sec"]) + " documents/sec")
+		print("  batched: " + str(res["batched"]["tokens_per_sec"]) + " tokens/sec, " + str(res["batched"]["documents_per_sec"]) + " documents/sec")
+		print("  peak RSS: " + str(res["peak_rss_mb"]) + " MB", flush = True)
+finally:
+	shutil.rmtree(workdir)
+
+if args.output:
+	with open(args.output, "w", encoding = "utf8") as f:
+		json.dump(results, f, indent = 2)
+
+if args.baseline:
+	with open(args.baseline, encoding = "utf8") as f:
+		baseline = json.load(f)
+	regressions = 0
+	for language in results["languages"]:
+		if language not in baseline["languages"]:
+			continue
+		old, new = baseline["languages"][language], results["languages"][language]
+		for stage in new["stages"]:
+			if stage in old["stages"] and old["stages"][stage] > 0:
+				change = new["stages"][stage] / old["stages"][stage] - 1.0
+				# very short stages (below 10 ms) are too noisy to be compared
+				slower = change > args.tolerance and new["stages"][stage] >= 0.01
+				regressions += 1 if slower else 0
+				print(language + " " + stage + ": " + ("+" if change >= 0 else "") + str(round(100 * change, 1)) + "%" + (" REGRESSION" if slower else ""))
+	print("Stages slower than the baseline by more than " + str(round(100 * args.tolerance)) + "%: " + str(regressions))
+	if regressions > 0:
+		exit(code = 1)
@@ -0,0 +1,49 @@
+from simplification import lightls
+from simplification import complexity
+from helpers import io_helper
+from embeddings import text_embeddings
+import argparse
+import random
+
+parser = argparse.ArgumentParser(description='Accuracy check of the quantised embedding storage: simplifies a sample corpus with float32, float16 and int8 embeddings and reports the memory used and the agreement of the substitutions made. Run from the repository root as: python -m benchmarks.quantization wordfreqs embs')
+parser.add_argument('wordfreqs', help='Path to the file containing the precomputed word frequencies')
+parser.add_argument('embs', help='Path to the file containing pre-trained word embeddings (textual or binary format)')
+parser.add_argument('-d', '--datadir', help='Path to the directory with the sample texts (if not provided, random texts are generated from the words of the frequency file)')
+parser.add_argument('-s', '--stopwords', help='Path to the file containing the list of stopwords')
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the (textual) embeddings file to read (default 200000)', default = 200000)
+parser.add_argument('-tc', '--tholdcmplx', type=float, help='Complexity threshold (default 0.2)', default = 0.2)
+parser.add_argument('-st', '--tholdsim', type=float, help='Similarity threshold (default 0.55)', default = 0.55)
+
+args = parser.parse_args()
+
+complexities = complexity.ComplexityTable.load(args.wordfreqs)
+stopwords = io_helper.load_lines(args.stopwords) if args.stopwords else None
+parameters = {"complexity_drop_threshold" : 0.03, "num_cand" : 10, "similarity_threshold" : args.tholdsim, "context_window_size" : 5, "complexity_threshold" : args.tholdcmplx}
+
+if args.datadir:
+	texts = [x[1] for x in io_helper.load_all_files(args.datadir)]
+else:
+	words = complexities.words[:50000]
+	rnd = random.Random(42)
+	texts = [" ".join(words[int(rnd.paretovariate(0.5)) % len(words)] for i in range(200)) for j in range(100)]
+
+results = {}
+for storage in ['float32', 'float16', 'int8']:
+	t_embeddings = text_embeddings.Embeddings()
+	if io_helper.is_binary_embeddings(args.embs):
+		t_embeddings.load_embeddings_binary(args.embs, language = 'default', mmap = False)
+	else:
+		t_embeddings.load_embeddings(args.embs, args.limit, language = 'default', skip_first_line = True, normalize = True)
+	t_embeddings.inverse_vocabularies()
+	if storage != 'float32':
+		t_embeddings.quantize('default', storage)
+	simplifier = lightls.LightLS(t_embeddings, complexities, parameters, stopwords)
+	subs = set()
+	for i, text in enumerate(texts):
+		subs.update((i, s[0], s[2]) for s in simplifier.simplify_text(text)[1])
+	results[storage] = subs
+	print(storage + ": " + str(round(t_embeddings.memory_usage('default') / 1048576.0, 1)) + " MB, " + str(len(subs)) + " substitutions")
+	if storage != 'float32':
+		reference = results['float32']
+		same = len(subs.intersection(reference))
+		print("  identical substitutions: " + str(same) + " (" + str(round(100.0 * same / max(len(reference), 1), 2)) + "% of float32 substitutions, " + str(round(100.0 * same / max(len(subs), 1), 2)) + "% of " + storage + " substitutions)")
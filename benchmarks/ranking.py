@@ -0,0 +1,72 @@
+from embeddings import text_embeddings
+from simplification import lightls
+import numpy as np
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description='Micro-benchmark of the candidate feature computation and ranking in LightLS, comparing the vectorised implementation with the original per-candidate loops (and checking that both choose the same candidates). Run from the repository root as: python -m benchmarks.ranking')
+parser.add_argument('-n', '--numtrials', type=int, help='Number of ranked candidate sets (default 20000)', default = 20000)
+parser.add_argument('-nc', '--numcands', type=int, help='Number of simpler candidates per target (default 10)', default = 10)
+parser.add_argument('-w', '--window', type=int, help='Number of context vectors per target (default 10)', default = 10)
+parser.add_argument('-d', '--dimension', type=int, help='Embedding size (default 300)', default = 300)
+
+args = parser.parse_args()
+
+def reference_choose_candidate(simplifier, tvec, simpler_candidates, context_vecs):
+	"""The original (loop-based) feature computation and ranking."""
+	for c in simpler_candidates:
+		simpler_candidates[c]["sim"] = np.dot(simplifier.embeddings.get_vector(simplifier.lang, c), tvec) 
+		if len(context_vecs) > 0:
+			csim = 0.0
+			for cv in context_vecs:
+				csim += np.dot(simplifier.embeddings.get_vector(simplifier.lang, c), cv)
+			simpler_candidates[c]["context"] = csim
+	feats = ["sim", "complexity_drop"] if len(context_vecs) == 0 else ["sim", "complexity_drop", "context"]
+	ranks = {}
+	for c in simpler_candidates:
+		ranks[c] = []
+	for f in feats:
+		feat_sorted = sorted({c : simpler_candidates[c][f] for c in simpler_candidates}.items(), key=lambda x:x[1])
+		for fs in feat_sorted:
+			ranks[fs[0]].append(feat_sorted.index(fs))
+	ranked_candidates = sorted({c : sum(ranks[c]) for c in ranks}.items(), key=lambda x:x[1])
+	return ranked_candidates[-1][0]
+
+def vectorised_choose_candidate(simplifier, tvec, simpler_candidates, context_vecs):
+	candidates = list(simpler_candidates)
+	for c, sim in zip(candidates, np.dot(simplifier.embeddings.get_vectors(simplifier.lang, candidates), tvec)):
+		simpler_candidates[c]["sim"] = sim
+	features = np.array([[simpler_candidates[c][f] for c in candidates] for f in ["sim", "complexity_drop"]])
+	if len(context_vecs) > 0:
+		features = np.vstack((features, simplifier.compute_context_features(simplifier.embeddings.get_vectors(simplifier.lang, candidates), [np.array(context_vecs)])))
+	return candidates[simplifier.rank_candidates(features)]
+
+rng = np.random.RandomState(42)
+vocab_size = 5000
+vectors = rng.uniform(-1.0, 1.0, size = (vocab_size, args.dimension)).astype(np.float32)
+vectors = vectors / np.linalg.norm(vectors, axis = 1, keepdims = True)
+embeddings = text_embeddings.Embeddings()
+embeddings.lang_vocabularies["default"] = {"w" + str(i) : i for i in range(vocab_size)}
+embeddings.lang_embeddings["default"] = vectors
+embeddings.lang_emb_norms["default"] = np.ones(vocab_size, dtype = np.float32)
+embeddings.emb_sizes["default"] = args.dimension
+simplifier = lightls.LightLS(embeddings, {"w0" : 1, "w1" : 1000}, {})
+
+trials = []
+for i in range(args.numtrials):
+	cands = ["w" + str(x) for x in rng.choice(vocab_size, args.numcands, replace = False)]
+	drops = rng.uniform(0.0, 0.5, size = args.numcands)
+	context = [vectors[x] for x in rng.choice(vocab_size, args.window, replace = False)]
+	trials.append((vectors[rng.randint(vocab_size)], {c : { "complexity_drop" : float(d) } for c, d in zip(cands, drops)}, context))
+
+start = time.perf_counter()
+reference = [reference_choose_candidate(simplifier, t, {c : dict(f) for c, f in cands.items()}, ctx) for t, cands, ctx in trials]
+reference_time = time.perf_counter() - start
+
+start = time.perf_counter()
+vectorised = [vectorised_choose_candidate(simplifier, t, {c : dict(f) for c, f in cands.items()}, ctx) for t, cands, ctx in trials]
+vectorised_time = time.perf_counter() - start
+
+print("Original ranking: " + str(round(1000000 * reference_time / args.numtrials, 1)) + " microseconds per target")
+print("Vectorised ranking: " + str(round(1000000 * vectorised_time / args.numtrials, 1)) + " microseconds per target (speed-up " + str(round(reference_time / vectorised_time, 2)) + "x)")
+print("Same chosen candidate: " + str(sum(r == v for r, v in zip(reference, vectorised))) + "/" + str(args.numtrials))
@@ -0,0 +1,31 @@
+from helpers import io_helper
+from embeddings import text_embeddings
+from embeddings import ann_index
+import argparse
+import os
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description='Builds an approximate nearest-neighbour (inverted-file) index over pre-trained word embeddings, used by the simplifier to speed up the search for candidate replacements in large vocabularies.')
+parser.add_argument('embs', help='Path to the file containing pre-trained word embeddings (textual format or binary format produced by convert_embeddings.py)')
+parser.add_argument('output', help='Path to the output file in which the index is to be stored')
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the (textual) embeddings file to read, must match the value used when running the simplifier (default 200000)', default = 200000)
+parser.add_argument('-nl', '--numlists', type=int, help='Number of inverted lists, i.e., k-means clusters (default: square root of the vocabulary size)', default = None)
+parser.add_argument('-it', '--iterations', type=int, help='Number of k-means iterations (default 10)', default = 10)
+
+args = parser.parse_args()
+
+if not os.path.isfile(args.embs):
+	print("Error: File containing pre-trained word embeddings not found.")
+	exit(code = 1)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Loading embeddings...", flush = True)
+t_embeddings = text_embeddings.Embeddings()
+if io_helper.is_binary_embeddings(args.embs):
+	t_embeddings.load_embeddings_binary(args.embs, language = 'default')
+else:
+	t_embeddings.load_embeddings(args.embs, args.limit, language = 'default', print_loading = True, skip_first_line = True, normalize = True)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Building the index...", flush = True)
+index = ann_index.IVFIndex().build(t_embeddings.lang_embeddings['default'], num_lists = args.numlists, iterations = args.iterations, print_progress = True)
+index.store(args.output)
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Index with " + str(len(index.centroids)) + " lists stored.", flush = True)
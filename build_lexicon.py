@@ -0,0 +1,61 @@
+from simplification import lightls
+from simplification import complexity
+from simplification import lexicon
+from helpers import io_helper
+from embeddings import text_embeddings
+from embeddings import ann_index
+import argparse
+import os
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description='Precomputes the (context-independent) simpler candidate replacements for all words of the embedding space and stores them in a compact substitution lexicon, which the simplifier can then use instead of the full embedding space.')
+parser.add_argument('wordfreqs', help='Path to the file containing the precomputed word frequencies in a large corpus (one pair word-frequency per line, word whitespace separated from its frequency), or the binary complexity table produced by convert_wordfreqs.py.')
+parser.add_argument('embs', help='Path to the file containing pre-trained word embeddings (textual format or binary format produced by convert_embeddings.py)')
+parser.add_argument('output', help='Path to the output file in which the substitution lexicon is to be stored')
+parser.add_argument('-s', '--stopwords', help='Path to the file containing the list of stopwords for the source language (the same list needs to be used when simplifying with the lexicon).')
+parser.add_argument('-tc', '--tholdcmplx', type=float, help='The minimal complexity of the word needed to consider replacing it with a simpler word. The lexicon can be used for simplification with this or any higher value, default = 0.2', default = 0.2)
+parser.add_argument('-nc', '--numcands', type=int, help='Number of candidate replacement words to consider (the same value needs to be used when simplifying with the lexicon, default 10)', default = 10)
+parser.add_argument('-cd', '--dropcmplx', type=float, help='The minimal drop in complexity that would be achieved by replacing the source text word with a replacement candidate. The lexicon can be used for simplification with this or any higher value, default = 0.03', default=0.03)
+parser.add_argument('-cw', '--contextwords', type=int, help='Number of most frequent words whose vectors are stored in the lexicon in addition to the candidate words, to be used for the contextual similarity features (default 20000)', default = 20000)
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the (textual) embeddings file to read, i.e., the size of the vocabulary (default 200000)', default = 200000)
+parser.add_argument('-ann', '--annindex', help='Path to the approximate nearest-neighbour index built with build_ann_index.py (if not provided, the exact search for candidates is performed)')
+parser.add_argument('-np', '--nprobe', type=int, help='Number of index lists searched for candidates when using the approximate nearest-neighbour index (default 8)', default = 8)
+
+args = parser.parse_args()
+
+if not os.path.isfile(args.embs):
+	print("Error: File containing pre-trained word embeddings not found.")
+	exit(code = 1)
+
+if not os.path.isfile(args.wordfreqs):
+	print("Error: File containing word frequencies (pre-computed from a large corpus) not found.")
+	exit(code = 1)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Loading embeddings...", flush = True)
+t_embeddings = text_embeddings.Embeddings()
+if io_helper.is_binary_embeddings(args.embs):
+	t_embeddings.load_embeddings_binary(args.embs, language = 'default')
+else:
+	t_embeddings.load_embeddings(args.embs, args.limit, language = 'default', print_loading = True, skip_first_line = True, normalize = True)
+t_embeddings.inverse_vocabularies()
+if args.annindex:
+	try:
+		t_embeddings.set_ann_index('default', ann_index.IVFIndex.load(args.annindex, nprobe = args.nprobe))
+	except ValueError as e:
+		print("Error: " + str(e))
+		exit(code = 1)
+
+print("Loading unigram frequencies...")
+complexities = complexity.ComplexityTable.load(args.wordfreqs)
+
+parameters = {"complexity_drop_threshold" : args.dropcmplx, "num_cand" : args.numcands, "complexity_threshold" : args.tholdcmplx}
+stopwords = io_helper.load_lines(args.stopwords) if args.stopwords else None
+simplifier = lightls.LightLS(t_embeddings, complexities, parameters, stopwords)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Building the substitution lexicon...", flush = True)
+vocabulary = t_embeddings.lang_vocabularies['default']
+words = sorted(vocabulary, key = lambda w: vocabulary[w])
+context_words = complexities.words[:args.contextwords]
+lex = lexicon.SubstitutionLexicon.build(simplifier, words, context_words = context_words, print_progress = True)
+lex.store(args.output)
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Stored the lexicon with " + str(len(lex)) + " target words and vectors of " + str(len(lex.words)) + " words.", flush = True)
@@ -0,0 +1,25 @@
+from helpers import io_helper
+import argparse
+import os
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description='Converts pre-trained word embeddings in textual format into the binary (memory-mappable) format loaded instantly by the simplifier.')
+parser.add_argument('embs', help='Path to the file containing pre-trained word embeddings in textual format (possibly gzip or xz compressed)')
+parser.add_argument('output', help='Path to the output file in which the binary embeddings are to be stored')
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the embeddings file to read (default 200000)', default = 200000)
+parser.add_argument('-nh', '--noheader', action='store_true', help='The first line of the embeddings file is an embedding (and not a header line with the vocabulary size and embedding dimension)')
+parser.add_argument('-nw', '--workers', type=int, help='Number of worker processes parsing chunks of the embeddings file in parallel (default 1)', default = 1)
+parser.add_argument('-nn', '--nonormalize', action='store_true', help='Store the vectors as they are, without unit-length normalization (the simplifier expects normalized vectors)')
+
+args = parser.parse_args()
+
+if not os.path.isfile(args.embs):
+	print("Error: File containing pre-trained word embeddings not found.")
+	exit(code = 1)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Loading textual embeddings...", flush = True)
+vocabulary, embs, norms = io_helper.load_embeddings_dict_with_norms(args.embs, limit = args.limit, print_load_progress = True, skip_first_line = not args.noheader, normalize = not args.nonormalize, num_workers = args.workers)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Storing " + str(embs.shape[0]) + " embeddings of size " + str(embs.shape[1]) + " in binary format...", flush = True)
+io_helper.store_embeddings_binary(args.output, vocabulary, embs, norms)
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Conversion completed.", flush = True)
@@ -0,0 +1,20 @@
+from simplification import complexity
+import argparse
+import os
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description='Converts the word frequency list into the binary complexity table (words, frequencies and precomputed complexities), loaded faster by the simplifier.')
+parser.add_argument('wordfreqs', help='Path to the file containing the precomputed word frequencies in a large corpus (one pair word-frequency per line, word whitespace separated from its frequency)')
+parser.add_argument('output', help='Path to the output file in which the binary complexity table is to be stored')
+
+args = parser.parse_args()
+
+if not os.path.isfile(args.wordfreqs):
+	print("Error: File containing word frequencies not found.")
+	exit(code = 1)
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Loading word frequencies...", flush = True)
+complexities = complexity.ComplexityTable.load_frequencies(args.wordfreqs)
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Storing the complexities of " + str(len(complexities)) + " words in binary format...", flush = True)
+complexities.store(args.output)
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Conversion completed.", flush = True)
@@ -0,0 +1,123 @@
+import numpy as np
+from embeddings.text_embeddings import top_k_rows, TOP_K_BLOCK_ELEMENTS
+
+def normalize_rows(vectors):
+	norms = np.linalg.norm(vectors, axis = 1, keepdims = True)
+	norms[norms == 0] = 1.0
+	return (vectors / norms).astype(np.float32)
+
+def assign_to_centroids(vectors, centroids):
+	block = max(1, TOP_K_BLOCK_ELEMENTS // len(centroids))
+	assignment = np.zeros(vectors.shape[0], dtype = np.int64)
+	for start in range(0, vectors.shape[0], block):
+		assignment[start : start + block] = np.argmax(np.dot(np.asarray(vectors[start : start + block], dtype = np.float32), np.transpose(centroids)), axis = 1)
+	return assignment
+
+class IVFIndex(object):
+	"""Inverted-file index (spherical k-means coarse quantisation) for approximate maximum dot-product search over an embedding matrix"""
+
+	def __init__(self, centroids = None, list_offsets = None, list_indices = None, nprobe = 8, num_rows = None, dimension = None):
+		self.centroids = centroids
+		self.list_offsets = list_offsets
+		self.list_indices = list_indices
+		self.nprobe = nprobe
+		# shape of the embedding matrix for which the index was built (None for indices stored without it)
+		self.num_rows = num_rows
+		self.dimension = dimension
+
+	def build(self, embeddings, num_lists = None, iterations = 10, sample_size = 100000, seed = 42, print_progress = False):
+		"""
+		Clusters (a sample of) the embedding vectors with spherical k-means and assigns every vector to the list of its closest centroid.
+		By default, the number of lists is (roughly) the square root of the vocabulary size.
+		"""
+		rng = np.random.RandomState(seed)
+		num_rows = embeddings.shape[0]
+		num_lists = min(num_rows, int(np.sqrt(num_rows)) if num_lists is None else num_lists)
+
+		sample = np.asarray(embeddings[np.sort(rng.choice(num_rows, min(num_rows, max(sample_size, num_lists)), replace = False))], dtype = np.float32)
+		centroids = sample[rng.choice(len(sample), num_lists, replace = False)].copy()
+		for it in range(iterations):
+			if print_progress:
+				print("K-means iteration " + str(it + 1) + "/" + str(iterations))
+			centroids = normalize_rows(centroids)
+			assignment = assign_to_centroids(sample, centroids)
+			sums = np.zeros(centroids.shape, dtype = np.float32)
+			np.add.at(sums, assignment, sample)
+			counts = np.bincount(assignment, minlength = num_lists)
+			# empty clusters are re-seeded with random sample vectors
+			empty = counts == 0
+			sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+			centroids = sums
+		self.centroids = normalize_rows(centroids)
+
+		self.set_lists(assign_to_centroids(embeddings, self.centroids), np.arange(num_rows))
+		self.num_rows, self.dimension = embeddings.shape
+		return self
+
+	def list_assignment(self):
+		return np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))
+
+	def set_lists(self, assignment, rows):
+		order = np.argsort(assignment, kind = 'stable')
+		self.list_indices = rows[order].astype(np.int64)
+		self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength = len(self.centroids))))).astype(np.int64)
+
+	def add_rows(self, vectors, start):
+		"""Assigns the vectors of new rows (numbered from start) to the lists of their closest centroids."""
+		assignment = np.concatenate((self.list_assignment(), assign_to_centroids(vectors, self.centroids)))
+		self.set_lists(assignment, np.concatenate((self.list_indices, np.arange(start, start + len(vectors)))))
+		self.num_rows = start + len(vectors)
+
+	def remap_rows(self, mapping):
+		"""Renumbers the rows after a compaction of the embedding matrix: mapping gives the new row of every old row (-1 for the dropped ones)."""
+		new_rows = mapping[self.list_indices]
+		kept = new_rows >= 0
+		self.set_lists(self.list_assignment()[kept], new_rows[kept])
+		self.num_rows = int(np.count_nonzero(mapping >= 0))
+
+	def search(self, queries, embeddings, num, nprobe = None, scales = None, live = None):
+		"""
+		Approximate counterpart of Embeddings.top_k_dot: scores only the vectors in the nprobe lists whose centroids are closest to the query.
+		Larger nprobe values give higher recall at the expense of speed. Rows with fewer than num scored vectors are padded with index -1.
+		For int8 embeddings, the per-row scales are applied to the scores. With a boolean mask of the live rows, the other rows are skipped.
+		"""
+		queries = np.atleast_2d(np.asarray(queries, dtype = np.float32))
+		nprobe = min(self.nprobe if nprobe is None else nprobe, len(self.centroids))
+		probes, _ = top_k_rows(np.dot(queries, np.transpose(self.centroids)), nprobe)
+
+		all_indices = np.full((len(queries), num), -1, dtype = np.int64)
+		all_scores = np.full((len(queries), num), -np.inf, dtype = np.float32)
+		for i in range(len(queries)):
+			rows = np.concatenate([self.list_indices[self.list_offsets[p] : self.list_offsets[p + 1]] for p in probes[i]])
+			if live is not None:
+				rows = rows[live[rows]]
+			if len(rows) == 0:
+				continue
+			rows.sort()
+			vectors = embeddings[rows]
+			scores = np.dot(vectors if vectors.dtype == np.float32 else vectors.astype(np.float32), queries[i])
+			if scales is not None:
+				scores *= scales[rows]
+			inds, scs = top_k_rows(scores.reshape(1, -1), min(num, len(rows)))
+			all_indices[i, : inds.shape[1]] = rows[inds[0]]
+			all_scores[i, : inds.shape[1]] = scs[0]
+		return all_indices, all_scores
+
+	def store(self, path):
+		with open(path, "wb") as f:
+			np.savez(f, centroids = self.centroids, list_offsets = self.list_offsets, list_indices = self.list_indices, shape = np.array([self.num_rows, self.dimension], dtype = np.int64))
+
+	@staticmethod
+	def load(path, nprobe = 8):
+		data = np.load(path)
+		num_rows, dimension = [int(x) for x in data["shape"]] if "shape" in data else (None, None)
+		return IVFIndex(data["centroids"], data["list_offsets"], data["list_indices"], nprobe = nprobe, num_rows = num_rows, dimension = dimension)
+
+	def check_matrix(self, num_rows, dimension):
+		"""Raises a ValueError if the index was not built for an embedding matrix of the given shape (e.g., of a pruned or differently limited vocabulary)."""
+		if self.centroids.shape[1] != dimension or (self.dimension is not None and self.dimension != dimension):
+			raise ValueError("The approximate index was built for embeddings of size " + str(self.centroids.shape[1]) + ", not " + str(dimension) + ".")
+		if self.num_rows is not None and self.num_rows != num_rows:
+			raise ValueError("The approximate index was built for " + str(self.num_rows) + " embedding vectors, not " + str(num_rows) + " (the index needs to be built for the same embeddings, vocabulary limit and pruning).")
+		if self.num_rows is None and len(self.list_indices) > 0 and self.list_indices.max() >= num_rows:
+			raise ValueError("The approximate index refers to rows beyond the " + str(num_rows) + " embedding vectors.")
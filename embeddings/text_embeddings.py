@@ -1,6 +1,7 @@
 import numpy as np
 from helpers import io_helper as ioh
 import codecs
+import time
 from helpers import io_helper
 
 def aggregate_phrase_embedding(words, text_embeddings, stopwords, punctuation, l2_norm_vec = True, lang = 'en', lang_prefix_words = False):
@@ -21,6 +22,29 @@ def aggregate_phrase_embedding(words, text_embeddings, stopwords, punctuation, l
 		res = res / np.linalg.norm(res)
 	return res
 
+TOP_K_BLOCK_ELEMENTS = 2 ** 24
+
+def top_k_rows(scores, k):
+	"""Column indices and values of the k largest scores in each row, ordered by decreasing score."""
+	if k < scores.shape[1]:
+		indices = np.argpartition(-scores, k - 1, axis = 1)[:, :k]
+	else:
+		indices = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+	top_scores = np.take_along_axis(scores, indices, axis = 1)
+	order = np.argsort(-top_scores, axis = 1, kind = 'stable')
+	return np.take_along_axis(indices, order, axis = 1), np.take_along_axis(top_scores, order, axis = 1)
+
+def quantize_rows(vectors, storage):
+	"""Quantised rows and their scales (None for float16): int8 rows are scaled so that the largest absolute value of each row maps to 127."""
+	if storage == 'float16':
+		return np.asarray(vectors, dtype = np.float16), None
+	elif storage == 'int8':
+		scales = (np.abs(vectors).max(axis = 1) / 127.0).astype(np.float32)
+		scales[scales == 0] = 1.0
+		return np.round(vectors / scales[:, np.newaxis]).astype(np.int8), scales
+	else:
+		raise ValueError("Unknown embeddings storage: " + str(storage))
+
 class Embeddings(object):
 	"""Captures functionality to load and store textual embeddings"""
 
@@ -31,12 +55,38 @@ class Embeddings(object):
 		self.emb_sizes = {}
 		self.cache = {}
 		self.do_cache = cache_similarities
+		self.ann_indices = {}
+		# per-row scales of the languages whose embeddings are quantised to int8
+		self.lang_emb_scales = {}
+		# optional RunStatistics (simplification.statistics), into which the neighbour searches are recorded
+		self.statistics = None
+		# languages whose vectors are normalized to unit length (their stored norms are those of the original vectors)
+		self.lang_normalized = {}
+		# buffers (matrix, norms, int8 scales) with spare rows for the words added to a language; its arrays are views of their first rows
+		self.lang_buffers = {}
+		# cached masks of the rows still belonging to words of the vocabulary (see live_rows)
+		self.live_masks = {}
+		# virtually merged spaces (see merge_embedding_spaces): their languages and the offsets of their rows
+		self.merged_spaces = {}
 
 	def inverse_vocabularies(self):
 		self.inverse_vocabularies = {}
 		for l in self.lang_vocabularies:
 			self.inverse_vocabularies[l] = {v: k for k, v in self.lang_vocabularies[l].items()}
 
+	def inverse_vocabulary(self, lang):
+		"""Builds the inverse vocabulary of a single language (leaving those of the other languages as they are, or building them first if not yet built)."""
+		if not isinstance(self.inverse_vocabularies, dict):
+			self.inverse_vocabularies()
+		self.inverse_vocabularies[lang] = {v: k for k, v in self.lang_vocabularies[lang].items()}
+
+	def unload(self, lang):
+		"""Removes the embeddings of the language (with its vocabulary, norms, scales and approximate index), releasing their memory."""
+		for language_dict in [self.lang_embeddings, self.lang_emb_norms, self.lang_vocabularies, self.emb_sizes, self.ann_indices, self.lang_emb_scales, self.lang_normalized, self.lang_buffers, self.live_masks, self.merged_spaces]:
+			language_dict.pop(lang, None)
+		if isinstance(self.inverse_vocabularies, dict):
+			self.inverse_vocabularies.pop(lang, None)
+
 	def get_word_from_index(self, index, lang = 'en'):
 		if index in self.inverse_vocabularies[lang]:
 			return self.inverse_vocabularies[lang][index]
@@ -45,13 +95,83 @@ class Embeddings(object):
 
 	def get_vector(self, lang, word):
 		if word in self.lang_vocabularies[lang]:
-			return self.lang_embeddings[lang][self.lang_vocabularies[lang][word]]
+			return self.get_rows(lang, self.lang_vocabularies[lang][word])
 		else: 
 			return None
 
+	def get_vectors(self, lang, words):
+		"""Matrix of the vectors of the given words (all of which need to be in the vocabulary)."""
+		vocabulary = self.lang_vocabularies[lang]
+		return self.get_rows(lang, [vocabulary[w] for w in words])
+
+	def get_rows(self, lang, indices):
+		"""Rows of the embedding matrix (a single row for an integer index), as float32 vectors regardless of the storage."""
+		if lang in self.merged_spaces:
+			return self.merged_rows(lang, indices)
+		rows = self.lang_embeddings[lang][indices]
+		if rows.dtype != np.float32:
+			rows = rows.astype(np.float32)
+		if lang in self.lang_emb_scales:
+			scales = self.lang_emb_scales[lang][indices]
+			rows = rows * (scales if np.ndim(rows) == 1 else scales[:, np.newaxis])
+		return rows
+
+	def merged_rows(self, merge_name, indices):
+		"""Rows of a virtually merged space, gathered from the matrices of its languages."""
+		languages, offsets = self.merged_spaces[merge_name]
+		ids = np.arange(*indices.indices(offsets[-1])) if isinstance(indices, slice) else np.asarray(indices, dtype = np.int64)
+		positions = np.searchsorted(offsets, ids, side = 'right') - 1
+		if ids.ndim == 0:
+			return self.get_rows(languages[positions], int(ids - offsets[positions]))
+		rows = np.empty((len(ids), self.emb_sizes[merge_name]), dtype = np.float32)
+		for i, lang in enumerate(languages):
+			selected = positions == i
+			if selected.any():
+				rows[selected] = self.get_rows(lang, ids[selected] - offsets[i])
+		return rows
+
+	def matrix_shape(self, lang):
+		"""Number of rows and columns of the embedding matrix of the language (or of a virtually merged space)."""
+		if lang in self.merged_spaces:
+			return int(self.merged_spaces[lang][1][-1]), self.emb_sizes[lang]
+		return self.lang_embeddings[lang].shape
+
+	def check_writable(self, lang, array = None):
+		if lang in self.merged_spaces:
+			raise ValueError("The space " + lang + " is virtually merged (read-only): merge its languages again after modifying them, or merge them with virtual = False.")
+		if array is not None and not np.asarray(array).flags.writeable:
+			raise ValueError("The embeddings of the language " + lang + " are memory-mapped (read-only): load them with mmap = False to modify them.")
+
 	def set_vector(self, lang, word, vector):
 		if word in self.lang_vocabularies[lang]:
-			self.lang_embeddings[lang][self.lang_vocabularies[lang][word]] = vector
+			self.check_writable(lang, self.lang_embeddings.get(lang))
+			if self.lang_normalized.get(lang, False):
+				vector = np.divide(vector, np.linalg.norm(vector, 2))
+			index = self.lang_vocabularies[lang][word]
+			if lang in self.lang_emb_scales:
+				self.lang_embeddings[lang][index], self.lang_emb_scales[lang][index] = [x[0] for x in quantize_rows(np.reshape(vector, (1, -1)), 'int8')]
+			else:
+				self.lang_embeddings[lang][index] = vector
+
+	def quantize(self, lang, storage = 'int8'):
+		"""
+		Converts the embeddings of the language into a compact storage: 'float16' (half of the memory) or 'int8' with a float32 scale 
+		per row (roughly a quarter of the memory). The vectors are dequantised on the fly, block by block, whenever they are used.
+		"""
+		embs = self.get_rows(lang, slice(None))
+		quantized, scales = quantize_rows(embs, storage)
+		self.lang_buffers.pop(lang, None)
+		self.lang_embeddings[lang] = quantized
+		if scales is not None:
+			self.lang_emb_scales[lang] = scales
+		else:
+			self.lang_emb_scales.pop(lang, None)
+
+	def memory_usage(self, lang):
+		"""Number of bytes taken by the embedding matrix, the norms and (for int8) the scales of the language (only the norms for a virtually merged space)."""
+		if lang in self.merged_spaces:
+			return self.lang_emb_norms[lang].nbytes
+		return self.lang_embeddings[lang].nbytes + np.asarray(self.lang_emb_norms[lang]).nbytes + (self.lang_emb_scales[lang].nbytes if lang in self.lang_emb_scales else 0)
 
 	def get_norm(self, lang, word):
 		if word in self.lang_vocabularies[lang]:
@@ -61,25 +181,150 @@ class Embeddings(object):
 
 	def set_norm(self, lang, word, norm):
 		if word in self.lang_vocabularies[lang]:
+			self.check_writable(lang, self.lang_emb_norms[lang])
 			self.lang_emb_norms[lang][self.lang_vocabularies[lang][word]] = norm
 
+	def reserve_rows(self, lang, num_new):
+		"""
+		Makes room for num_new rows after the rows of the language and returns the number of its rows. The matrix, the norms and (for int8) the 
+		scales are views of buffers whose capacity is doubled when exhausted (the first time, e.g., for memory-mapped embeddings, the rows are
+		copied into new buffers), so that adding words one at a time takes amortised constant time per word.
+		"""
+		self.check_writable(lang)
+		embs = self.lang_embeddings[lang]
+		norms = self.lang_emb_norms[lang]
+		scales = self.lang_emb_scales.get(lang)
+		num_rows = embs.shape[0]
+		buffers = self.lang_buffers.get(lang)
+		valid = buffers is not None and embs.base is buffers[0] and isinstance(norms, np.ndarray) and norms.base is buffers[1] and (scales is None or (buffers[2] is not None and scales.base is buffers[2]))
+		if not valid or len(buffers[0]) < num_rows + num_new:
+			capacity = max(num_rows + num_new, 2 * num_rows, 16)
+			buffers = (np.empty((capacity, embs.shape[1]), dtype = embs.dtype), np.empty(capacity, dtype = np.float32), None if scales is None else np.empty(capacity, dtype = np.float32))
+			buffers[0][:num_rows] = embs
+			buffers[1][:num_rows] = norms
+			if scales is not None:
+				buffers[2][:num_rows] = scales
+			self.lang_buffers[lang] = buffers
+			self.set_num_rows(lang, num_rows)
+		return num_rows
+
+	def set_num_rows(self, lang, num_rows):
+		buffers = self.lang_buffers[lang]
+		self.lang_embeddings[lang] = buffers[0][:num_rows]
+		self.lang_emb_norms[lang] = buffers[1][:num_rows]
+		if buffers[2] is not None:
+			self.lang_emb_scales[lang] = buffers[2][:num_rows]
+
+	def add_words(self, lang, words, vectors = None):
+		"""
+		Adds the words which are not yet in the vocabulary (each once, with its first vector) in bulk, with the given vectors (a matrix with a row
+		per word) or random ones. The new rows are appended after the existing ones. Returns the number of added words.
+		"""
+		self.check_writable(lang)
+		vocabulary = self.lang_vocabularies[lang]
+		added = {}
+		for i, w in enumerate(words):
+			if w not in vocabulary and w not in added:
+				added[w] = i
+		if len(added) == 0:
+			return 0
+		if vectors is None:
+			vecs = np.random.uniform(-1.0, 1.0, size = [len(added), self.emb_sizes[lang]])
+		else:
+			vecs = np.asarray(vectors)[list(added.values())]
+		norms = np.linalg.norm(vecs, axis = 1)
+		if self.lang_normalized.get(lang, False):
+			vecs = np.divide(vecs, norms[:, np.newaxis])
+
+		start = self.reserve_rows(lang, len(added))
+		end = start + len(added)
+		buffers = self.lang_buffers[lang]
+		if buffers[2] is not None:
+			buffers[0][start : end], buffers[2][start : end] = quantize_rows(vecs, 'int8')
+		else:
+			buffers[0][start : end] = vecs
+		buffers[1][start : end] = norms
+		self.set_num_rows(lang, end)
+		vocabulary.update(zip(added, range(start, end)))
+		if lang in self.ann_indices:
+			self.ann_indices[lang].add_rows(self.get_rows(lang, slice(start, end)), start)
+		if isinstance(self.inverse_vocabularies, dict) and lang in self.inverse_vocabularies:
+			self.inverse_vocabularies[lang].update(zip(range(start, end), added))
+		self.live_masks.pop(lang, None)
+		return len(added)
+
 	def add_word(self, lang, word, vector = None):
-		if word not in self.lang_vocabularies[lang]:
-			self.lang_vocabularies[lang][word] = len(self.lang_vocabularies[lang])
-			rvec = np.random.uniform(-1.0, 1.0, size = [self.emb_sizes[lang]]) if vector is None else vector
-			rnrm = np.linalg.norm(rvec, 2)
-			self.lang_embeddings[lang] = np.vstack((self.lang_embeddings[lang], rvec))
-			self.lang_emb_norms[lang] = np.concatenate((self.lang_emb_norms[lang], [rnrm]))	
+		self.add_words(lang, [word], None if vector is None else np.reshape(vector, (1, -1)))
 
 	def remove_word(self, lang, word):
-		self.lang_vocabularies[lang].pop(word, None)
+		"""Removes the word from the vocabulary. Its row is excluded from the neighbour search and reclaimed by compact."""
+		row = self.lang_vocabularies[lang].pop(word, None)
+		if row is None:
+			return
+		self.live_masks.pop(lang, None)
+		if isinstance(self.inverse_vocabularies, dict) and self.inverse_vocabularies.get(lang, {}).get(row) == word:
+			del self.inverse_vocabularies[lang][row]
+
+	def compact(self, lang):
+		"""
+		Reclaims the rows which do not belong to words of the vocabulary (e.g., of the removed words): the remaining rows are copied, in their
+		order, into new arrays, and the vocabulary, the inverse vocabulary and the approximate index of the language are renumbered accordingly.
+		Returns the number of reclaimed rows.
+		"""
+		live = self.live_rows(lang)
+		if live is None:
+			return 0
+		rows = np.flatnonzero(live)
+		mapping = np.full(len(live), -1, dtype = np.int64)
+		mapping[rows] = np.arange(len(rows))
+		self.lang_buffers.pop(lang, None)
+		self.live_masks.pop(lang, None)
+		self.lang_embeddings[lang] = self.lang_embeddings[lang][rows]
+		self.lang_emb_norms[lang] = np.asarray(self.lang_emb_norms[lang], dtype = np.float32)[rows]
+		if lang in self.lang_emb_scales:
+			self.lang_emb_scales[lang] = self.lang_emb_scales[lang][rows]
+		vocabulary = self.lang_vocabularies[lang]
+		new_rows = mapping[np.fromiter(vocabulary.values(), dtype = np.int64, count = len(vocabulary))].tolist()
+		self.lang_vocabularies[lang] = dict(zip(vocabulary, new_rows))
+		if isinstance(self.inverse_vocabularies, dict) and lang in self.inverse_vocabularies:
+			self.inverse_vocabulary(lang)
+		if lang in self.ann_indices:
+			self.ann_indices[lang].remap_rows(mapping)
+		return len(live) - len(rows)
 	
-	def load_embeddings(self, filepath, limit, language = 'en', print_loading = False, skip_first_line = False, min_one_letter = False, special_tokens = None, normalize = False):
-		vocabulary, embs, norms = ioh.load_embeddings_dict_with_norms(filepath, limit = limit, special_tokens = special_tokens, print_load_progress = print_loading, skip_first_line = skip_first_line, min_one_letter = min_one_letter, normalize = normalize)		
+	def load_embeddings(self, filepath, limit, language = 'en', print_loading = False, skip_first_line = False, min_one_letter = False, special_tokens = None, normalize = False, vocabulary_filter = None, num_workers = 1):
+		vocabulary, embs, norms = ioh.load_embeddings_dict_with_norms(filepath, limit = limit, special_tokens = special_tokens, print_load_progress = print_loading, skip_first_line = skip_first_line, min_one_letter = min_one_letter, normalize = normalize, vocabulary_filter = vocabulary_filter, num_workers = num_workers)		
 		self.lang_embeddings[language] = embs
 		self.lang_emb_norms[language] = norms
+		self.lang_emb_scales.pop(language, None)
+		self.lang_buffers.pop(language, None)
+		self.lang_normalized[language] = normalize
 		self.emb_sizes[language] = embs.shape[1]
 		self.lang_vocabularies[language] = vocabulary	
+
+	def load_embeddings_binary(self, filepath, language = 'en', mmap = True, vocabulary_filter = None, print_loading = False):
+		vocabulary, embs, norms = ioh.load_embeddings_binary(filepath, mmap = mmap)
+		if vocabulary_filter is not None:
+			# the rows of the kept words are copied (in their original order) into memory
+			kept = sorted(vocabulary[w] for w in vocabulary if w in vocabulary_filter)
+			if print_loading:
+				print("Embeddings kept: " + str(len(kept)) + ", filtered out: " + str(embs.shape[0] - len(kept)) + " (memory saved: " + str(round((embs.shape[0] - len(kept)) * embs.shape[1] * 4 / 1048576.0, 1)) + " MB)")
+			inverse = {vocabulary[w] : w for w in vocabulary}
+			vocabulary = {inverse[ind] : i for i, ind in enumerate(kept)}
+			embs = np.array(embs[kept], dtype = np.float32).reshape((len(kept), embs.shape[1]))
+			norms = np.array(norms[kept], dtype = np.float32)
+		self.lang_embeddings[language] = embs
+		self.lang_emb_norms[language] = norms
+		self.lang_emb_scales.pop(language, None)
+		self.lang_buffers.pop(language, None)
+		# the binary format does not record whether the vectors were normalized (by default, they are): a sample of rows is checked
+		sample = np.asarray(embs[: 1000], dtype = np.float32)
+		self.lang_normalized[language] = len(sample) > 0 and bool(np.allclose(np.linalg.norm(sample, axis = 1), 1.0, atol = 1e-3))
+		self.emb_sizes[language] = embs.shape[1]
+		self.lang_vocabularies[language] = vocabulary
+
+	def store_embeddings_binary(self, path, language):
+		ioh.store_embeddings_binary(path, self.lang_vocabularies[language], self.get_rows(language, slice(None)), self.lang_emb_norms[language])
 	
 
 	def word_similarity(self, first_word, second_word, first_language = 'en', second_language = 'en'):	
@@ -97,11 +342,11 @@ class Embeddings(object):
 		index_second = self.lang_vocabularies[second_language][second_word] if second_word in self.lang_vocabularies[second_language] else (self.lang_vocabularies[second_language][second_word.lower()] if second_word.lower() in self.lang_vocabularies[second_language] else -1)		
 
 		if index_first >= 0 and index_second >= 0:		
-			first_emb = self.lang_embeddings[first_language][index_first]
-			second_emb = self.lang_embeddings[second_language][index_second] 
+			first_emb = self.get_rows(first_language, index_first)
+			second_emb = self.get_rows(second_language, index_second)
 
-			first_norm = self.lang_emb_norms[first_language][index_first]
-			second_norm = self.lang_emb_norms[second_language][index_second]
+			first_norm = self.row_norms(first_language, index_first)
+			second_norm = self.row_norms(second_language, index_second)
 
 			score =  np.dot(first_emb, second_emb) / (first_norm * second_norm)
 		else:
@@ -114,66 +359,203 @@ class Embeddings(object):
 					self.cache[first_language + "-" + second_language][cache_str] = score		
 		return score
 
+	def row_norms(self, lang, indices = None):
+		"""Norms of the rows (all or the given ones) of the embedding matrix: the stored norms, or ones for vectors normalized to unit length."""
+		norms = np.asarray(self.lang_emb_norms[lang], dtype = np.float32)
+		if indices is not None:
+			norms = norms[indices]
+		if self.lang_normalized.get(lang, False):
+			return np.ones_like(norms)
+		return norms
+
+	def live_rows(self, lang):
+		"""
+		Boolean mask of the rows of the embedding matrix which belong to words of the vocabulary (None if all of them do), cached until words
+		are added or removed.
+		"""
+		vocabulary = self.lang_vocabularies[lang]
+		num_rows = self.matrix_shape(lang)[0]
+		if len(vocabulary) == num_rows:
+			return None
+		cached = self.live_masks.get(lang)
+		if cached is not None and cached[0] is vocabulary and cached[1] == len(vocabulary) and len(cached[2]) == num_rows:
+			return cached[2]
+		live = np.zeros(num_rows, dtype = bool)
+		live[np.fromiter(vocabulary.values(), dtype = np.int64, count = len(vocabulary))] = True
+		self.live_masks[lang] = (vocabulary, len(vocabulary), live)
+		return live
+
 	def most_similar(self, embedding, target_lang, num, similarity = True):
-		ms = []
-		for w in self.lang_vocabularies[target_lang]:
-			targ_w_emb = self.get_vector(target_lang, w)
-			if len(embedding) != len(targ_w_emb):
-				print("Unaligned embedding length: " + w)
-			else:
-				if similarity:
-					nrm = np.linalg.norm(embedding, 2)
-					trg_nrm = self.get_norm(target_lang, w)
-					sim = np.dot(embedding, targ_w_emb) / (nrm * trg_nrm)
-					if (len(ms) < num) or (sim > ms[-1][1]):	
-						ms.append((w, sim))
-						ms.sort(key = lambda x: x[1], reverse = True)
-				else:
-					dist = np.linalg.norm(embedding - targ_w_emb)
-					if (len(ms) < num) or (dist < ms[-1][1]):	
-						ms.append((w, dist))
-						ms.sort(key = lambda x: x[1])
-				if len(ms) > num: 
-						ms.pop() 
-		return [ws for ws in ms]
+		"""The num words closest to the vector, as (word, score) pairs: by cosine similarity (largest first) or, if similarity is False, by Euclidean distance (smallest first)."""
+		if len(embedding) != self.emb_sizes[target_lang]:
+			print("Unaligned embedding length: " + str(len(embedding)))
+			return []
+		return self.most_similar_batch(np.reshape(embedding, (1, -1)), target_lang, num, similarity = similarity)[0]
+
+	def most_similar_batch(self, embeddings, target_lang, num, similarity = True, max_block_elements = TOP_K_BLOCK_ELEMENTS):
+		"""
+		Batched most_similar for the rows of the query matrix, computed block-wise with top_k_dot. The cosine similarities use the stored norms 
+		of the rows; the Euclidean distances are obtained from the dot products and the (squared) norms of the queries and of the rows.
+		"""
+		queries = np.atleast_2d(np.asarray(embeddings, dtype = np.float32))
+		norms = self.row_norms(target_lang)
+		live = self.live_rows(target_lang)
+		if similarity:
+			query_norms = np.linalg.norm(queries, axis = 1, keepdims = True)
+			row_scales = np.divide(1.0, norms, out = np.zeros(len(norms), dtype = np.float32), where = norms > 0)
+			row_offsets = None if live is None else np.where(live, np.float32(0.0), np.float32(-np.inf))
+			indices, scores = self.top_k_dot(np.divide(queries, query_norms, out = np.zeros(queries.shape, dtype = np.float32), where = query_norms > 0), target_lang, num = num, max_block_elements = max_block_elements, row_scales = row_scales, row_offsets = row_offsets)
+		else:
+			# ranking by -|q - r|^2 + |q|^2 = 2 q.r - |r|^2
+			row_offsets = -np.square(norms)
+			if live is not None:
+				row_offsets[~live] = -np.inf
+			indices, scores = self.top_k_dot(2.0 * queries, target_lang, num = num, max_block_elements = max_block_elements, row_offsets = row_offsets)
+			scores = np.sqrt(np.maximum(np.square(np.linalg.norm(queries, axis = 1, keepdims = True)) - scores, 0.0))
+
+		vocabulary = self.lang_vocabularies[target_lang]
+		inverse = self.inverse_vocabularies.get(target_lang) if isinstance(self.inverse_vocabularies, dict) else None
+		if inverse is None or len(inverse) != len(vocabulary):
+			inverse = {v : k for k, v in vocabulary.items()}
+		return [[(inverse[i], s) for i, s in zip(row_indices, row_scores) if i in inverse and np.isfinite(s)] for row_indices, row_scores in zip(indices.tolist(), scores.tolist())]
 
 	def most_similar_fast_cosine(self, embedding, target_lang, num = 1, without_first = False):
-		dot = np.dot(embedding, np.transpose(self.lang_embeddings[target_lang]))
-		indices = np.argsort(dot)[-1 * (num + (1 if without_first else 0)) :][::-1]
-		words = [self.get_word_from_index(ind, lang = target_lang) for ind in indices]
-		return words[1:] if without_first else words	
+		return self.most_similar_fast_cosine_batch(np.reshape(embedding, (1, -1)), target_lang, num = num, without_first = without_first)[0]
+
+	def most_similar_fast_cosine_batch(self, embeddings, target_lang, num = 1, without_first = False):
+		if self.statistics is not None:
+			start = time.perf_counter()
+		# the rows of removed words are not searched
+		live = self.live_rows(target_lang)
+		if target_lang in self.ann_indices:
+			indices, scores = self.ann_indices[target_lang].search(embeddings, self.lang_embeddings[target_lang], num + (1 if without_first else 0), scales = self.lang_emb_scales.get(target_lang), live = live)
+			indices = indices[:, 1:] if without_first else indices
+		else:
+			row_offsets = None if live is None else np.where(live, np.float32(0.0), np.float32(-np.inf))
+			indices, scores = self.top_k_dot(embeddings, target_lang, num = num, without_first = without_first, row_offsets = row_offsets)
+			if live is not None:
+				indices[~np.isfinite(scores)] = -1
+		if self.statistics is not None:
+			self.statistics.add_time("candidate_search.ann" if target_lang in self.ann_indices else "candidate_search.exact", time.perf_counter() - start)
+			self.statistics.count("search_queries", len(embeddings))
+		return [[self.get_word_from_index(ind, lang = target_lang) for ind in row if ind >= 0] for row in indices]
+
+	def set_ann_index(self, lang, index):
+		"""Makes the (fast cosine) neighbour search for the language use an approximate index (e.g., ann_index.IVFIndex) instead of the exact search."""
+		if index is None:
+			self.ann_indices.pop(lang, None)
+		elif lang in self.merged_spaces:
+			raise ValueError("The space " + lang + " is virtually merged: approximate indices are built over the matrices of single languages, merge them with virtual = False to index the merged space.")
+		else:
+			index.check_matrix(*self.matrix_shape(lang))
+			self.ann_indices[lang] = index
+
+	def block_dot(self, queries, lang, start, end):
+		"""
+		Dot products of the queries with the block of rows of the embedding matrix, dequantised on the fly (int8 scales are applied to the products).
+		For a virtually merged space, the products with the parts of the block in the matrices of its languages are joined.
+		"""
+		if lang in self.merged_spaces:
+			languages, offsets = self.merged_spaces[lang]
+			end = min(end, offsets[-1])
+			return np.concatenate([self.block_dot(queries, l, max(start, offsets[i]) - offsets[i], min(end, offsets[i + 1]) - offsets[i]) for i, l in enumerate(languages) if offsets[i] < end and offsets[i + 1] > start], axis = 1)
+		block = self.lang_embeddings[lang][start : end]
+		scores = np.dot(queries, np.transpose(block if block.dtype == np.float32 else block.astype(np.float32)))
+		if lang in self.lang_emb_scales:
+			scores *= self.lang_emb_scales[lang][start : end]
+		return scores
+
+	def top_k_dot(self, embeddings, target_lang, num = 1, without_first = False, max_block_elements = TOP_K_BLOCK_ELEMENTS, row_scales = None, row_offsets = None):
+		"""
+		Finds, for each row of the query matrix, the num vocabulary entries with the largest dot product. The 
+		products are computed block-wise (at most max_block_elements scores at a time) and the top entries 
+		are selected with argpartition. Returns the matrices of indices and scores, ordered by decreasing score.
+		If given, the scores of each row are multiplied by row_scales and row_offsets are added to them.
+		"""
+		queries = np.atleast_2d(np.asarray(embeddings, dtype = np.float32))
+		num_rows, dimension = self.matrix_shape(target_lang)
+		k = min(num + (1 if without_first else 0), num_rows)
+		query_block = max(1, min(len(queries), max_block_elements // max(k, 1)))
+		# blocks are bounded both by the number of scores and by the size of the (dequantised) embedding block
+		vocab_block = max(k, min(max_block_elements // query_block, max_block_elements // dimension))
+
+		all_indices = np.zeros((len(queries), k), dtype = np.int64)
+		all_scores = np.zeros((len(queries), k), dtype = np.float32)
+		for qstart in range(0, len(queries), query_block):
+			qblock = queries[qstart : qstart + query_block]
+			best_indices = np.zeros((len(qblock), 0), dtype = np.int64)
+			best_scores = np.zeros((len(qblock), 0), dtype = np.float32)
+			for vstart in range(0, num_rows, vocab_block):
+				scores = self.block_dot(qblock, target_lang, vstart, vstart + vocab_block)
+				if row_scales is not None:
+					scores *= row_scales[vstart : vstart + vocab_block]
+				if row_offsets is not None:
+					scores += row_offsets[vstart : vstart + vocab_block]
+				inds, scs = top_k_rows(scores, k)
+				cand_indices = np.concatenate((best_indices, inds + vstart), axis = 1)
+				cand_scores = np.concatenate((best_scores, scs), axis = 1)
+				sel, best_scores = top_k_rows(cand_scores, k)
+				best_indices = np.take_along_axis(cand_indices, sel, axis = 1)
+			all_indices[qstart : qstart + len(qblock)] = best_indices
+			all_scores[qstart : qstart + len(qblock)] = best_scores
+
+		if without_first:
+			return all_indices[:, 1:], all_scores[:, 1:]
+		return all_indices, all_scores
 	
-	def merge_embedding_spaces(self, languages, emb_size, merge_name = 'merge', lang_prefix_delimiter = '__', special_tokens = None):
+	def merge_embedding_spaces(self, languages, emb_size, merge_name = 'merge', lang_prefix_delimiter = '__', special_tokens = None, virtual = False):
+		"""
+		Merges the embedding spaces of the languages into one space (merge_name), whose words are prefixed with their language (e.g., en__house),
+		except the special tokens. The rows of each language follow those of the previous languages: the merged matrix is preallocated and the
+		matrix of each language is copied into it as a block (in its storage if all languages share it, otherwise dequantised to float32). With
+		virtual set, no matrix is built: the merged space records the row offsets of the languages and its rows (and the neighbour search over 
+		them) are read from the matrices of the languages. A virtual space is read-only and needs to be merged again after words are added to 
+		the languages or the languages are compacted. The inverse vocabulary of the merged space is built as well (with those of all languages, if not
+		yet built).
+		"""
 		print("Merging embedding spaces...")
+		offsets = np.cumsum([0] + [self.lang_embeddings[lang].shape[0] for lang in languages])
+		special = set(special_tokens) if special_tokens is not None else set()
 		merge_vocabulary = {}
-		merge_embs = []
-		merge_norms = []
-
-		for lang in languages:
+		merge_norms = np.empty(offsets[-1], dtype = np.float32)
+		for i, lang in enumerate(languages):
 			print("For language: " + lang)
-			norms =[]
-			embs = []
-			for word in self.lang_vocabularies[lang]:
-				if special_tokens is None or word not in special_tokens:
-					merge_vocabulary[lang + lang_prefix_delimiter + word] = len(merge_vocabulary)
+			vocabulary = self.lang_vocabularies[lang]
+			words = [w if w in special else lang + lang_prefix_delimiter + w for w in vocabulary]
+			rows = np.fromiter(vocabulary.values(), dtype = np.int64, count = len(vocabulary)) + offsets[i]
+			merge_vocabulary.update(zip(words, rows.tolist()))
+			merge_norms[offsets[i] : offsets[i + 1]] = self.lang_emb_norms[lang][: offsets[i + 1] - offsets[i]]
+
+		for language_dict in [self.lang_embeddings, self.lang_emb_scales, self.ann_indices, self.lang_buffers, self.live_masks, self.merged_spaces]:
+			language_dict.pop(merge_name, None)
+		if virtual:
+			self.merged_spaces[merge_name] = (list(languages), offsets)
+		else:
+			dtypes = set(self.lang_embeddings[lang].dtype for lang in languages)
+			scaled = [lang in self.lang_emb_scales for lang in languages]
+			same_storage = len(dtypes) == 1 and (all(scaled) or not any(scaled))
+			merge_embs = np.empty((offsets[-1], emb_size), dtype = dtypes.pop() if same_storage else np.float32)
+			merge_scales = np.empty(offsets[-1], dtype = np.float32) if same_storage and all(scaled) else None
+			block = max(1, TOP_K_BLOCK_ELEMENTS // emb_size)
+			for i, lang in enumerate(languages):
+				num_rows = offsets[i + 1] - offsets[i]
+				if same_storage:
+					merge_embs[offsets[i] : offsets[i + 1]] = self.lang_embeddings[lang]
+					if merge_scales is not None:
+						merge_scales[offsets[i] : offsets[i + 1]] = self.lang_emb_scales[lang]
 				else:
-					merge_vocabulary[word] = len(merge_vocabulary)
-				embs.append(self.get_vector(lang, word))
-				norms.append(self.get_norm(lang, word))
-			merge_embs =  np.copy(embs) if len(merge_embs) == 0 else np.vstack((merge_embs, embs))
-			merge_norms = np.copy(norms) if len(merge_norms) == 0 else np.concatenate((merge_norms, norms))
-
-		#if padding_token is not None:
-		#	merge_vocabulary[padding_token] = len(merge_vocabulary)
-		#	rvec = np.random.uniform(-1.0, 1.0, size = [emb_size])
-		#	rnrm = np.linalg.norm(rvec, 2)
-		#	merge_embs = np.vstack((merge_embs, rvec))
-		#	merge_norms = np.concatenate((merge_norms, [rnrm]))
-			
+					for start in range(0, num_rows, block):
+						end = min(start + block, num_rows)
+						merge_embs[offsets[i] + start : offsets[i] + end] = self.get_rows(lang, slice(start, end))
+			self.lang_embeddings[merge_name] = merge_embs
+			if merge_scales is not None:
+				self.lang_emb_scales[merge_name] = merge_scales
+
 		self.lang_vocabularies[merge_name] = merge_vocabulary
-		self.lang_embeddings[merge_name] = merge_embs
 		self.lang_emb_norms[merge_name] = merge_norms
-		self.emb_sizes[merge_name] = emb_size  
+		self.lang_normalized[merge_name] = all(self.lang_normalized.get(lang, False) for lang in languages)
+		self.emb_sizes[merge_name] = emb_size
+		self.inverse_vocabulary(merge_name)
 
-	def store_embeddings(self, path, language):
-		io_helper.store_embeddings(path, self, language)
\ No newline at end of file
+	def store_embeddings(self, path, language, compress = False):
+		io_helper.store_embeddings(path, self, language, compress = compress)
\ No newline at end of file
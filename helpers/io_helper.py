@@ -1,5 +1,12 @@
 from __future__ import division
 import codecs
+import gzip
+import io
+import json
+import lzma
+import multiprocessing
+import sys
+from collections import deque
 from os import listdir
 from os.path import isfile, join
 import pickle
@@ -55,75 +62,355 @@ def load_all_files(dirpath):
 		files.append((filename, load_file(dirpath + "/" + filename)))
 	return files
 
-################################################################################################################################
+def iterate_files(dirpath):
+	"""Lazily loads the files of the directory, one at a time."""
+	for filename in listdir(dirpath):
+		yield (filename, load_file(dirpath + "/" + filename))
 
-def store_embeddings(path, embeddings, language, print_progress = True):
-	f = codecs.open(path,'w',encoding='utf8')
-	vocab = embeddings.lang_vocabularies[language]
-	embs = 	embeddings.lang_embeddings[language]
+def iterate_lines(filepath):
+	"""Lazily reads the (stripped) lines of the file, or of the standard input if the path is '-'."""
+	f = io.TextIOWrapper(sys.stdin.buffer, encoding = 'utf8', errors = 'replace') if filepath == "-" else codecs.open(filepath, "r", encoding = 'utf8', errors = 'replace')
+	try:
+		for line in f:
+			yield line.strip()
+	finally:
+		if filepath != "-":
+			f.close()
+
+# size (in bytes) of the buffers of the output files, and number of lines (or rows) joined into one string before being written
+OUTPUT_BUFFER_SIZE = 1 << 20
+WRITE_BLOCK_SIZE = 10000
+
+def open_text_output(path, append = False, compress = False):
+	"""Opens the file for writing UTF-8 text through a large buffer, gzip compressed with compress, or the standard output if the path is '-'."""
+	if path == "-":
+		return io.TextIOWrapper(sys.stdout.buffer, encoding = 'utf8')
+	if compress:
+		return io.TextIOWrapper(io.BufferedWriter(gzip.open(path, 'ab' if append else 'wb'), OUTPUT_BUFFER_SIZE), encoding = 'utf8', newline = '')
+	return open(path, 'a' if append else 'w', encoding = 'utf8', newline = '', buffering = OUTPUT_BUFFER_SIZE)
+
+def write_lines(f, lines):
+	"""Writes the lines (without their newlines), joined into blocks of WRITE_BLOCK_SIZE lines."""
+	for start in range(0, len(lines), WRITE_BLOCK_SIZE):
+		f.write("".join(l + "\n" for l in lines[start : start + WRITE_BLOCK_SIZE]))
+
+def write_jsonl(path, records, append = False, compress = False):
+	"""Writes the (JSON-serialisable) records, one JSON object per line."""
+	with open_text_output(path, append, compress) as f:
+		write_lines(f, [json.dumps(r, ensure_ascii = False) for r in records])
 
-	cnt = 0
-	for word in vocab:
-		cnt += 1
-		if print_progress and cnt % 1000 == 0:
-			print("Storing embeddings " + str(cnt))
-		f.write((word if not word.startswith("en_") else word.replace("en_", "").strip()) + " ")
-		for i in range(len(embs[vocab[word]])):
-			f.write(str(embs[vocab[word]][i]) + " ")
-		f.write("\n")
-	f.close()
+################################################################################################################################
 
-def load_embeddings_dict_with_norms(filepath, limit = None, special_tokens = None, print_load_progress = False, min_one_letter = False, skip_first_line = False, normalize = False):
-	norms = []
+def store_embeddings(path, embeddings, language, print_progress = True, compress = False):
+	"""
+	Writes the embeddings in textual format (in the order of the vocabulary), formatting the rows of a block of words at once. The components are
+	written with 9 significant digits, which are read back as exactly the same float32 values.
+	"""
+	vocab = embeddings.lang_vocabularies[language]
+	words = list(vocab)
+	with open_text_output(path, compress = compress) as f:
+		for start in range(0, len(words), WRITE_BLOCK_SIZE):
+			block = words[start : start + WRITE_BLOCK_SIZE]
+			rows = embeddings.get_rows(language, [vocab[w] for w in block])
+			row_format = " ".join(["%.9g"] * rows.shape[1])
+			f.write("".join((w if not w.startswith("en_") else w.replace("en_", "").strip()) + " " + row_format % tuple(r) + " \n" for w, r in zip(block, rows.tolist())))
+			if print_progress:
+				print("Storing embeddings " + str(start + len(block)))
+
+# size (in bytes) of the chunks of whole lines into which textual embedding files are split for parsing
+EMBEDDINGS_CHUNK_SIZE = 1 << 24
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# file and options of the embeddings being parsed, inherited by the worker processes (when forking) instead of being pickled with every chunk
+embedding_parse_options = None
+
+def open_embeddings_input(filepath):
+	"""Opens the file for reading bytes, decompressing gzip and xz files (recognised by their magic bytes) as a stream."""
+	with open(filepath, "rb") as f:
+		magic = f.read(len(XZ_MAGIC))
+	if magic.startswith(GZIP_MAGIC):
+		return gzip.open(filepath, "rb")
+	if magic == XZ_MAGIC:
+		return lzma.open(filepath, "rb")
+	return open(filepath, "rb")
+
+def is_compressed(filepath):
+	with open(filepath, "rb") as f:
+		magic = f.read(len(XZ_MAGIC))
+	return magic.startswith(GZIP_MAGIC) or magic == XZ_MAGIC
+
+def end_of_lines(data, num_lines):
+	"""Offset just after the num_lines-th newline of the data (None if the data has fewer lines)."""
+	offset = 0
+	for i in range(num_lines):
+		offset = data.find(b"\n", offset) + 1
+		if offset == 0:
+			return None
+	return offset
+
+def iterate_embedding_chunks(filepath, chunk_size, limit = None):
+	"""
+	Chunks of whole lines covering the first limit lines of the file (all lines without a limit): byte ranges (start, end) of an uncompressed file
+	(read by the process parsing the chunk), the decompressed bytes of a compressed one. Each chunk comes with a flag marking the first one.
+	"""
+	compressed = is_compressed(filepath)
+	with open_embeddings_input(filepath) as f:
+		start = 0
+		lines = 0
+		rest = b""
+		while True:
+			block = f.read(chunk_size)
+			if len(block) == 0:
+				# the last line, without a trailing newline
+				if len(rest) > 0 and (not limit or lines < limit):
+					yield (rest if compressed else (start, start + len(rest))), start == 0
+				return
+			data = rest + block
+			cut = data.rfind(b"\n") + 1
+			if cut == 0:
+				rest = data
+				continue
+			num_lines = data.count(b"\n", 0, cut)
+			if limit and lines + num_lines >= limit:
+				cut = end_of_lines(data, limit - lines)
+				yield (data[:cut] if compressed else (start, start + cut)), start == 0
+				return
+			yield (data[:cut] if compressed else (start, start + cut)), start == 0
+			lines += num_lines
+			start += cut
+			rest = data[cut:]
+
+def parse_embedding_line(line, min_one_letter = False, vocabulary_filter = None):
+	"""The word and the vector of a line (None for the skipped words); raises an error for lines which are not in the correct format."""
+	splt = line.split()
+	word = splt[0]
+	if min_one_letter and not any(c.isalpha() for c in word):
+		return None
+	if vocabulary_filter is not None and word not in vocabulary_filter:
+		return None
+	return word, np.array([x for x in splt[1:]], dtype = np.float32)
+
+def find_embedding_size(filepath, limit = None, skip_first_line = False, min_one_letter = False, vocabulary_filter = None):
+	"""The size of the first loaded vector with more than 10 components (-1 if there is none), which all loaded vectors need to have."""
+	with open_embeddings_input(filepath) as f:
+		for cnt, line in enumerate(f, 1):
+			if limit and cnt > limit:
+				break
+			if cnt == 1 and skip_first_line:
+				continue
+			try:
+				parsed = parse_embedding_line(line.decode("utf8", errors = "replace"), min_one_letter, vocabulary_filter)
+			except (ValueError, IndexError):
+				continue
+			if parsed is not None and len(parsed[1]) > 10:
+				return len(parsed[1])
+	return -1
+
+def parse_embedding_chunk(job):
+	"""
+	Parses a chunk of lines into the words and the matrix of their vectors (with their norms). The vectors of all lines are parsed at once,
+	the lines are parsed one by one only if the chunk contains lines which are not in the correct format or vectors of another size.
+	Returns the words, the vectors, the norms, the number of lines and the numbers of incorrect and filtered-out lines.
+	"""
+	filepath, emb_size, skip_first_line, min_one_letter, vocabulary_filter, normalize = embedding_parse_options
+	data, first_chunk = job
+	if isinstance(data, tuple):
+		with open(filepath, "rb") as f:
+			f.seek(data[0])
+			data = f.read(data[1] - data[0])
+	lines = data.decode("utf8", errors = "replace").split("\n")
+	if lines[-1] == "":
+		lines.pop()
+
+	words = []
+	rests = []
+	incorrect = 0
+	filtered = 0
+	for line in (lines[1:] if first_chunk and skip_first_line else lines):
+		splt = line.split(None, 1)
+		if len(splt) == 0:
+			incorrect += 1
+			continue
+		if min_one_letter and not any(c.isalpha() for c in splt[0]):
+			continue
+		# words not in the filter (if given) are skipped without parsing their vectors
+		if vocabulary_filter is not None and splt[0] not in vocabulary_filter:
+			filtered += 1
+			continue
+		# lines without a vector are skipped as vectors of a wrong size
+		if len(splt) == 2:
+			words.append(splt[0])
+			rests.append(splt[1])
+
+	vectors = None
+	if len(rests) > 0:
+		try:
+			vectors = np.loadtxt(rests, dtype = np.float32, comments = None, ndmin = 2)
+			if vectors.shape[1] != emb_size:
+				words, vectors = [], None
+		except ValueError:
+			vectors = None
+	if vectors is None and len(words) > 0:
+		kept_words = []
+		kept = []
+		for word, rest in zip(words, rests):
+			try:
+				vec = np.array(rest.split(), dtype = np.float32)
+			except ValueError:
+				incorrect += 1
+				continue
+			if len(vec) == emb_size:
+				kept_words.append(word)
+				kept.append(vec)
+		words = kept_words
+		vectors = np.array(kept, dtype = np.float32)
+	if len(words) == 0:
+		vectors = np.zeros((0, max(emb_size, 0)), dtype = np.float32)
+
+	norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors, dtype = np.float64)).astype(np.float32)
+	if normalize:
+		vectors /= norms[:, np.newaxis]
+	return words, vectors, norms, len(lines), incorrect, filtered
+
+def parse_embedding_chunks(jobs, num_workers = 1):
+	"""Parses the chunks (in worker processes, with more than one worker), yielding the results in the order of the chunks."""
+	if num_workers <= 1:
+		for job in jobs:
+			yield parse_embedding_chunk(job)
+		return
+	with multiprocessing.get_context("fork").Pool(num_workers) as pool:
+		# at most two chunks per worker are read ahead, so that (decompressed) chunks do not pile up in memory
+		pending = deque()
+		for job in jobs:
+			pending.append(pool.apply_async(parse_embedding_chunk, (job,)))
+			if len(pending) >= 2 * num_workers:
+				yield pending.popleft().get()
+		while len(pending) > 0:
+			yield pending.popleft().get()
+
+def load_embeddings_dict_with_norms(filepath, limit = None, special_tokens = None, print_load_progress = False, min_one_letter = False, skip_first_line = False, normalize = False, vocabulary_filter = None, num_workers = 1, chunk_size = EMBEDDINGS_CHUNK_SIZE):
+	"""
+	Loads embeddings in textual format (a word and its vector per line), possibly gzip or xz compressed. Only the first limit lines are read;
+	the first line is skipped with skip_first_line (header), words without letters with min_one_letter and words not in the vocabulary_filter
+	(if given) without parsing their vectors. All vectors need to have the size of the first loaded vector with more than 10 components, the others
+	are skipped. The file is split into chunks of whole lines, parsed in num_workers processes and written in the order of the lines into a
+	preallocated matrix. The special tokens get constant vectors, after those of the file. Returns the vocabulary, the matrix and the norms.
+	"""
+	global embedding_parse_options
+	emb_size = find_embedding_size(filepath, limit, skip_first_line, min_one_letter, vocabulary_filter)
+	embedding_parse_options = (filepath, emb_size, skip_first_line, min_one_letter, vocabulary_filter, normalize)
+	num_special = len(special_tokens) if special_tokens is not None else 0
+
+	# the rows cannot outnumber the lines; without a limit, the matrix grows as needed (resizing large arrays does not copy them)
+	embeddings = np.empty(((limit if limit else chunk_size // 64) + num_special, max(emb_size, 0)), dtype = np.float32)
+	norms = np.empty(len(embeddings), dtype = np.float32)
 	vocabulary = {}
-	embeddings = []
 	cnt = 0
 	cnt_dict = 0
-	emb_size = -1
-
-	with codecs.open(filepath,'r',encoding='utf8', errors='replace') as f:
-		for line in f:
-			try:
-				cnt += 1
-				if limit and cnt > limit: 
-					break
-				if print_load_progress and (cnt % 1000 == 0): 
-					print("Loading embeddings: " + str(cnt))
-				if cnt > 1 or not skip_first_line:
-					splt = line.split()
-					word = splt[0]
-					if min_one_letter and not any(c.isalpha() for c in word):
-						continue
-
-					vec = np.array([x for x in splt[1:]], dtype = np.float32)
-					if emb_size < 0 and len(vec) > 10:
-						emb_size = len(vec)
-
-					if emb_size > 0 and len(vec) == emb_size:
-						vocabulary[word] = cnt_dict
-						cnt_dict += 1
-						norm = np.linalg.norm(vec)
-						norms.append(norm)
-						if normalize: 
-							embeddings.append(np.divide(vec, norm))			
-						else: 
-							embeddings.append(vec)			
-			except(ValueError,IndexError,UnicodeEncodeError):
+	cnt_filtered = 0
+	try:
+		for words, vectors, chunk_norms, num_lines, incorrect, filtered in parse_embedding_chunks(iterate_embedding_chunks(filepath, chunk_size, limit), num_workers):
+			if cnt_dict + len(words) + num_special > len(embeddings):
+				capacity = max(2 * len(embeddings), cnt_dict + len(words) + num_special)
+				embeddings.resize((capacity, embeddings.shape[1]), refcheck = False)
+				norms.resize(capacity, refcheck = False)
+			embeddings[cnt_dict : cnt_dict + len(words)] = vectors
+			norms[cnt_dict : cnt_dict + len(words)] = chunk_norms
+			# as when adding the words one by one, a repeated word is mapped to its last vector
+			vocabulary.update(zip(words, range(cnt_dict, cnt_dict + len(words))))
+			cnt_dict += len(words)
+			cnt += num_lines
+			cnt_filtered += filtered
+			for i in range(incorrect):
 				print("Incorrect format line!")
-	
+			if print_load_progress:
+				print("Loading embeddings: " + str(cnt))
+	finally:
+		embedding_parse_options = None
+
+	if print_load_progress and vocabulary_filter is not None:
+		print("Embeddings kept: " + str(cnt_dict) + ", filtered out: " + str(cnt_filtered) + " (memory saved: " + str(round(cnt_filtered * max(emb_size, 0) * 4 / 1048576.0, 1)) + " MB)")
+
 	if special_tokens is not None:
 		for st in special_tokens:
 			vocabulary[st] = cnt_dict
-			cnt_dict += 1
 			vec = np.array([0.1 * (special_tokens.index(st) + 1)] * emb_size) #np.random.uniform(-1.0, 1.0, size = [emb_size])
 			norm = np.linalg.norm(vec)
-			norms.append(norm)
-			if normalize: 
-				embeddings.append(np.divide(vec, norm))			
-			else: 
-				embeddings.append(vec)
+			norms[cnt_dict] = norm
+			embeddings[cnt_dict] = np.divide(vec, norm) if normalize else vec
+			cnt_dict += 1
 
-	return vocabulary, np.array(embeddings, dtype = np.float32), norms 
+	embeddings.resize((cnt_dict, embeddings.shape[1]), refcheck = False)
+	norms.resize(cnt_dict, refcheck = False)
+	return vocabulary, embeddings, norms
+
+############################################################################################################################
+
+# lists of words stored in numpy (.npz) archives, as newline-separated UTF-8 bytes
+
+def encode_words(words):
+	return np.frombuffer("\n".join(words).encode("utf8"), dtype = np.uint8)
+
+def decode_words(array):
+	return array.tobytes().decode("utf8").split("\n") if len(array) > 0 else []
+
+############################################################################################################################
+
+# Binary embeddings format: an 8-byte magic string, a header of three int64 values (number of rows, 
+# embedding size, length of the vocabulary section in bytes), the float32 embedding matrix, the float32 
+# vector norms and, finally, the newline-separated UTF-8 vocabulary (one word per matrix row, in row order)
+
+BINARY_EMBEDDINGS_MAGIC = b"LLSEMB01"
+BINARY_EMBEDDINGS_HEADER_SIZE = len(BINARY_EMBEDDINGS_MAGIC) + 3 * 8
+
+def is_binary_embeddings(filepath):
+	with open(filepath, "rb") as f:
+		return f.read(len(BINARY_EMBEDDINGS_MAGIC)) == BINARY_EMBEDDINGS_MAGIC
+
+def store_embeddings_binary(path, vocabulary, embeddings, norms):
+	embeddings = np.ascontiguousarray(embeddings, dtype = np.float32)
+	norms = np.ascontiguousarray(norms, dtype = np.float32)
+	if len(norms) != embeddings.shape[0]:
+		raise ValueError("Number of norms does not match the number of embedding vectors!")
+
+	words = [""] * embeddings.shape[0]
+	for w in vocabulary:
+		words[vocabulary[w]] = w
+	vocab_bytes = "\n".join(words).encode("utf8")
+
+	with open(path, "wb") as f:
+		f.write(BINARY_EMBEDDINGS_MAGIC)
+		f.write(np.array([embeddings.shape[0], embeddings.shape[1], len(vocab_bytes)], dtype = np.int64).tobytes())
+		f.write(embeddings.tobytes())
+		f.write(norms.tobytes())
+		f.write(vocab_bytes)
+
+def load_embeddings_binary(filepath, mmap = True):
+	"""
+	Loads embeddings stored with store_embeddings_binary. With mmap, the matrix and the norms are read-only 
+	memory-mapped views of the file (pages are loaded on demand and shared between processes reading the same file).
+	Returns the vocabulary, the embedding matrix and the vector norms.
+	"""
+	with open(filepath, "rb") as f:
+		if f.read(len(BINARY_EMBEDDINGS_MAGIC)) != BINARY_EMBEDDINGS_MAGIC:
+			raise ValueError("Not a binary embeddings file: " + filepath)
+		num_rows, emb_size, vocab_length = [int(x) for x in np.frombuffer(f.read(3 * 8), dtype = np.int64)]
+		vocab_offset = BINARY_EMBEDDINGS_HEADER_SIZE + 4 * num_rows * (emb_size + 1)
+		f.seek(vocab_offset)
+		words = f.read(vocab_length).decode("utf8").split("\n") if vocab_length > 0 else []
+
+	if mmap:
+		embeddings = np.memmap(filepath, dtype = np.float32, mode = "r", offset = BINARY_EMBEDDINGS_HEADER_SIZE, shape = (num_rows, emb_size))
+		norms = np.memmap(filepath, dtype = np.float32, mode = "r", offset = BINARY_EMBEDDINGS_HEADER_SIZE + 4 * num_rows * emb_size, shape = (num_rows,))
+	else:
+		with open(filepath, "rb") as f:
+			f.seek(BINARY_EMBEDDINGS_HEADER_SIZE)
+			embeddings = np.fromfile(f, dtype = np.float32, count = num_rows * emb_size).reshape((num_rows, emb_size))
+			norms = np.fromfile(f, dtype = np.float32, count = num_rows)
+
+	vocabulary = {w : i for i, w in enumerate(words) if w != ""}
+	return vocabulary, embeddings, norms
 
 ############################################################################################################################
 
@@ -145,11 +432,9 @@ def load_bless_dataset(path):
 	lcols = [(x[0].split('-')[0], x[3].split('-')[0], "1" if x[2] == "hyper" else "0") for x in [l.strip().split() for l in lines]]
 	return lcols
 
-def write_list(path, list):
-	f = codecs.open(path,'w',encoding='utf8')
-	for l in list:
-		f.write(l + "\n")
-	f.close()
+def write_list(path, list, compress = False):
+	with open_text_output(path, compress = compress) as f:
+		write_lines(f, list)
 
 def write_dictionary(path, dictionary, append = False, delimiter = "\t"):
 	f = codecs.open(path,'a' if append else 'w',encoding='utf8')
@@ -168,15 +453,10 @@ def load_translation_pairs(filepath):
 			dataset.append((srcword, trgword)); 
 	return dataset	
 
-def write_list_tuples_separated(path, list, delimiter = '\t', append = False):
-	f = codecs.open(path,'a' if append else 'w', encoding='utf8')
-	for i in range(len(list)):
-		for j in range(len(list[i])):
-			if j == len(list[i]) - 1: 
-				f.write(str(list[i][j]) + '\n')
-			else:
-				f.write(str(list[i][j]) + delimiter)  
-	f.close()
+def write_list_tuples_separated(path, list, delimiter = '\t', append = False, compress = False):
+	with open_text_output(path, append, compress) as f:
+		# (empty tuples are not written)
+		write_lines(f, [delimiter.join([str(x) for x in t]) for t in list if len(t) > 0])
 
 def store_wordnet_rels(dirpath, relname, pos, lang, instances):
 	f = codecs.open(dirpath + "/" + lang + "_" + relname + "_" + pos + ".txt",'w',encoding='utf8')
@@ -1,3 +1,5 @@
+import functools
+
 def longest_common_subsequence(S,T):
     m = len(S)
     n = len(T)
@@ -15,4 +17,26 @@ def longest_common_subsequence(S,T):
                     lcs_set.add(S[i-c+1:i+1])
                 elif c == longest:
                     lcs_set.add(S[i-c+1:i+1])
-    return lcs_set
\ No newline at end of file
+    return lcs_set
+
+def has_common_substring(S,T,length):
+    """Whether S and T share a substring of the given (positive) length, stopping at the first one found."""
+    if len(S) > len(T):
+        S, T = T, S
+    return any(S[i:i+length] in T for i in range(len(S) - length + 1))
+
+@functools.lru_cache(maxsize = 1000000)
+def is_morphological_variant(target, candidate, min_length = 6, max_difference = 3):
+    """
+    Whether the candidate is (likely) a derivational morphological variant of the target word: one contains the other, or both are 
+    at least min_length characters long and share a substring at most max_difference characters shorter than the shorter of them.
+    """
+    if candidate in target or target in candidate:
+        return True
+    if len(target) < min_length or len(candidate) < min_length:
+        return False
+    return has_common_substring(target, candidate, min(len(target), len(candidate)) - max_difference)
+
+def filter_morphological_variants(target, candidates, min_length = 6, max_difference = 3):
+    """The candidates (in the given order) which are not morphological variants of the target word, checked one by one with the memoised is_morphological_variant."""
+    return [c for c in candidates if not is_morphological_variant(target, c, min_length, max_difference)]
@@ -0,0 +1,60 @@
+from simplification import languages
+from simplification import service
+from simplification import statistics
+import argparse
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description='Runs a long-running lexical simplification server, which loads the embeddings and word complexities once and serves simplification requests over HTTP (POST /simplify, GET /health).')
+parser.add_argument('wordfreqs', nargs='?', help='Path to the file containing the precomputed word frequencies in a large corpus (one pair word-frequency per line, word whitespace separated from its frequency), or the binary complexity table produced by convert_wordfreqs.py.')
+parser.add_argument('embs', nargs='?', help='Path to the file containing pre-trained word embeddings (textual format or binary format produced by convert_embeddings.py). Not needed when simplifying with a precomputed substitution lexicon (option -lex). Neither is needed when the languages are configured with the option -lc.')
+parser.add_argument('-s', '--stopwords', help='Path to the file containing the list of stopwords for the source language.')
+parser.add_argument('-tc', '--tholdcmplx', type=float, help='The default minimal complexity of the word needed to consider replacing it with a simpler word, default = 0.2', default = 0.2)
+parser.add_argument('-nc', '--numcands', type=int, help='The default number of candidate replacement words to consider (default 10)', default = 10)
+parser.add_argument('-st', '--tholdsim', type=float, help='The default minimal cosine similarity between the embeddings of the original word and the candidate replacement word required for replacement, default = 0.55', default=0.55)
+parser.add_argument('-cd', '--dropcmplx', type=float, help='The default minimal drop in complexity that would be achieved by replacing the source text word with a replacement candidate, default = 0.03', default=0.03)
+parser.add_argument('-w', '--window', type=int, help='The default size of the symmetric window around the original word defining the contextual words (default = 5)', default=5)
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the (textual) embeddings file to read, i.e., the size of the vocabulary (default 200000)', default = 200000)
+parser.add_argument('-ann', '--annindex', help='Path to the approximate nearest-neighbour index built with build_ann_index.py (if not provided, the exact search for candidates is performed)')
+parser.add_argument('-np', '--nprobe', type=int, help='Number of index lists searched for candidates when using the approximate nearest-neighbour index (default 8)', default = 8)
+parser.add_argument('-lex', '--lexicon', help='Path to the substitution lexicon precomputed with build_lexicon.py. With the lexicon, the full embedding space is not loaded.')
+parser.add_argument('-pr', '--prune', action='store_true', help='Keep in memory only the embeddings of the words from the frequency list which can be target words, candidate replacements or context words (see options -bt, -bc and -bx)')
+parser.add_argument('-bt', '--budgettargets', type=int, help='With pruning, the number of (most frequent) words more complex than the -tc threshold kept as potential target words (default 100000)', default = 100000)
+parser.add_argument('-bc', '--budgetcandidates', type=int, help='With pruning, the number of most frequent non-stopwords kept as potential candidate replacements (default 30000)', default = 30000)
+parser.add_argument('-bx', '--budgetcontext', type=int, help='With pruning, the number of most frequent words kept as potential context words (default 50000)', default = 50000)
+parser.add_argument('-q', '--quantize', choices = ['float16', 'int8'], help='Store the embeddings in memory in a compact form: float16 (half of the memory) or int8 with per-vector scales (roughly a quarter of the memory), default: float32 (no quantisation)')
+parser.add_argument('-cs', '--cachesize', type=int, help='Maximal number of target words whose candidate replacements are cached, 0 disables the cache (default 100000)', default = 100000)
+parser.add_argument('-rs', '--runstats', action='store_true', help='Record the time spent in each stage of the simplification and the numbers of tokens not simplified by reason, reported by the /health endpoint')
+parser.add_argument('-lc', '--languages', help='Path to the JSON file configuring the models of several languages served by one process (a JSON object mapping each language to its options, e.g., {"en" : {"wordfreqs" : "unigram-freqs-en.txt", "embs" : "embs-en.bin", "stopwords" : "stopwords-en.txt"}}, with the options named as the long options of this script). The model of a language is loaded on its first request, the options not given for a language take the values given to this script.')
+parser.add_argument('-mb', '--memorybudget', type=float, help='With the option -lc, the memory (in MB) the models of the languages may take together: the least recently used languages are unloaded to stay within it (default: no limit)')
+parser.add_argument('--host', help='Host (interface) on which the server listens (default 127.0.0.1)', default = '127.0.0.1')
+parser.add_argument('--port', type=int, help='Port on which the server listens (default 8080)', default = 8080)
+parser.add_argument('--socket', help='Path to the Unix socket on which the server listens (instead of the host and port)')
+parser.add_argument('--maxbatch', type=int, help='Maximal number of texts simplified in one batch (default 256)', default = 256)
+parser.add_argument('--maxdelay', type=float, help='Maximal time (in milliseconds) a request waits for other requests to be batched with (default 5)', default = 5.0)
+parser.add_argument('--maxpending', type=int, help='Maximal number of requests being processed or waiting at once, further requests are rejected with the status 503 (default 1024)', default = 1024)
+
+args = parser.parse_args()
+
+run_stats = statistics.RunStatistics() if args.runstats else None
+memory_budget = args.memorybudget * 1048576 if args.memorybudget is not None else None
+try:
+	if args.languages:
+		defaults = {o : getattr(args, o) for o in languages.DEFAULT_OPTIONS if o not in languages.PATH_OPTIONS}
+		models = languages.LanguageModels(languages.load_config(args.languages, defaults), memory_budget, cache_size = args.cachesize, statistics = run_stats, print_loading = True)
+	else:
+		options = languages.language_options({o : getattr(args, o) for o in languages.DEFAULT_OPTIONS})
+		languages.check_options("default", options)
+		models = languages.LanguageModels({"default" : options}, cache_size = args.cachesize, statistics = run_stats, print_loading = True)
+except ValueError as e:
+	print("Error: " + str(e))
+	exit(code = 1)
+
+if not args.languages:
+	# a single model is loaded at once, not on the first request
+	models.get("default")
+
+server = service.SimplificationService(models, max_batch_texts = args.maxbatch, max_batch_delay = args.maxdelay / 1000.0, max_pending = args.maxpending)
+try:
+	server.run(host = args.host, port = args.port, socket_path = args.socket)
+except KeyboardInterrupt:
+	print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Server stopped.", flush = True)
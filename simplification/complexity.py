@@ -0,0 +1,83 @@
+import codecs
+import numpy as np
+from helpers import io_helper
+
+# the binary tables are stored as (uncompressed) numpy .npz archives, i.e., zip files
+BINARY_TABLE_MAGIC = b"PK\x03\x04"
+
+def is_binary_table(path):
+	with open(path, "rb") as f:
+		return f.read(len(BINARY_TABLE_MAGIC)) == BINARY_TABLE_MAGIC
+
+def compute_complexities(frequencies):
+	"""Complexities of words, inversely proportional to the logarithm of their frequencies, min-max normalized to [0, 1]."""
+	complexities = 1.0 / np.log2(np.asarray(frequencies, dtype = np.float64) + 2)
+	min_complexity = complexities.min()
+	max_complexity = complexities.max()
+	return ((complexities - min_complexity) / (max_complexity - min_complexity)).astype(np.float32)
+
+class ComplexityTable(object):
+	"""Word frequencies and complexities in arrays, indexed by the ids of a single word -> id dictionary"""
+
+	def __init__(self, words, frequencies, complexities = None):
+		self.ids = {w : i for i, w in enumerate(words)}
+		if len(self.ids) < len(words):
+			# as in a dictionary built from the list, the last frequency of a repeated word is kept
+			keep = np.sort(np.fromiter(self.ids.values(), dtype = np.int64, count = len(self.ids)))
+			words = [words[i] for i in keep]
+			frequencies = np.asarray(frequencies)[keep]
+			complexities = None
+			self.ids = {w : i for i, w in enumerate(words)}
+		self.words = words
+		self.frequencies = np.asarray(frequencies, dtype = np.int64)
+		self.complexities = compute_complexities(self.frequencies) if complexities is None else complexities
+
+	def __len__(self):
+		return len(self.words)
+
+	def __contains__(self, word):
+		return word in self.ids
+
+	def __getitem__(self, word):
+		return float(self.complexities[self.ids[word]])
+
+	def get(self, word, default = 1.0):
+		i = self.ids.get(word)
+		return default if i is None else float(self.complexities[i])
+
+	def get_ids(self, words):
+		"""Ids of the words, -1 for the words not in the table."""
+		return np.fromiter((self.ids.get(w, -1) for w in words), dtype = np.int64, count = len(words))
+
+	def get_complexities(self, ids, default = 1.0):
+		"""Complexities of the words with the given ids (the default complexity for ids -1)."""
+		ids = np.asarray(ids, dtype = np.int64)
+		return np.where(ids >= 0, self.complexities[ids], np.float32(default))
+
+	@staticmethod
+	def from_dict(word_freqs):
+		return ComplexityTable(list(word_freqs), np.fromiter(word_freqs.values(), dtype = np.int64, count = len(word_freqs)))
+
+	@staticmethod
+	def load_frequencies(filepath):
+		"""Loads the frequency list (one pair word-frequency per line, whitespace separated, further columns are ignored); lines without an integer frequency are reported and skipped."""
+		with codecs.open(filepath, "r", encoding = "utf8", errors = "replace") as f:
+			lines_split = [l.split() for l in f.read().splitlines()]
+		pairs = [x for x in lines_split if len(x) >= 2 and x[1].isdigit()]
+		for i in range(sum(1 for x in lines_split if len(x) > 0) - len(pairs)):
+			print("Incorrect format line!")
+		if len(pairs) == 0:
+			raise ValueError("No word frequencies found in " + filepath + " (expected one pair word-frequency per line).")
+		return ComplexityTable([x[0] for x in pairs], np.array([x[1] for x in pairs]).astype(np.int64))
+
+	@staticmethod
+	def load(path):
+		"""Loads the table either from the (textual) frequency list or from the binary file created with store()."""
+		if not is_binary_table(path):
+			return ComplexityTable.load_frequencies(path)
+		data = np.load(path)
+		return ComplexityTable(io_helper.decode_words(data["words"]), data["frequencies"], data["complexities"])
+
+	def store(self, path):
+		with open(path, "wb") as f:
+			np.savez(f, words = io_helper.encode_words(self.words), frequencies = self.frequencies, complexities = self.complexities)
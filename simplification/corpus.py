@@ -0,0 +1,201 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from helpers import io_helper
+from simplification.lightls import SUBSTITUTION_FIELDS
+
+# name of the manifest of the simplified files, in the output directory
+MANIFEST_NAME = "manifest.jsonl"
+
+# simplifier used by the worker processes, inherited from the parent process (when forking) instead of being pickled
+worker_simplifier = None
+
+def content_hash(filepath):
+	digest = hashlib.sha256()
+	with open(filepath, "rb") as f:
+		for block in iter(lambda: f.read(1 << 20), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+def file_signature(path):
+	"""Identifies a (model) file by its absolute path, size and modification time, without reading it."""
+	stat = os.stat(path)
+	return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+def run_fingerprint(settings):
+	"""Hash of the settings of a run (JSON-serialisable: parameters, signatures of the model files, options)."""
+	return hashlib.sha256(json.dumps(settings, sort_keys = True).encode("utf8")).hexdigest()
+
+def output_paths(filepath, outdir, compress = False):
+	suffix = ".gz" if compress else ""
+	return outdir + "/" + os.path.basename(filepath) + suffix, outdir + "/" + os.path.splitext(os.path.basename(filepath))[0] + ".subs" + suffix
+
+def substitution_records(subs, document = None):
+	"""The substitutions as dictionaries with the fields SUBSTITUTION_FIELDS (preceded by the number of the document, if given)."""
+	if document is None:
+		return [dict(zip(SUBSTITUTION_FIELDS, s)) for s in subs]
+	return [dict([("document", document)] + list(zip(SUBSTITUTION_FIELDS, s))) for s in subs]
+
+class RunManifest(object):
+	"""Record (manifest.jsonl) of the files simplified into an output directory, used to skip the unchanged files when a run is repeated"""
+
+	def __init__(self, outdir, fingerprint, compress = False):
+		self.outdir = outdir
+		self.compress = compress
+		self.path = outdir + "/" + MANIFEST_NAME
+		self.fingerprint = fingerprint
+		self.entries = {}
+		num_lines = 0
+		if os.path.isfile(self.path):
+			with open(self.path, encoding = "utf8") as f:
+				for line in f:
+					num_lines += 1
+					try:
+						entry = json.loads(line)
+					except ValueError:
+						# the last line can be incomplete if the run was killed while writing it
+						continue
+					self.entries[entry["file"]] = entry
+		# entries superseded by the later ones (of the files simplified again) are dropped once they make up half of the manifest
+		if num_lines > 2 * len(self.entries):
+			with open(self.path + ".part", "w", encoding = "utf8") as f:
+				f.write("".join(json.dumps(entry, ensure_ascii = False) + "\n" for entry in self.entries.values()))
+			os.replace(self.path + ".part", self.path)
+
+	def pending(self, filepaths):
+		"""The files (with their content hashes and stats) which still need to be simplified"""
+		pending = {}
+		for filepath in filepaths:
+			stat = os.stat(filepath)
+			entry = self.entries.get(os.path.basename(filepath))
+			done = entry is not None and entry["fingerprint"] == self.fingerprint and all(os.path.isfile(p) for p in output_paths(filepath, self.outdir, self.compress))
+			if done and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+				continue
+			digest = content_hash(filepath)
+			if done and entry["hash"] == digest:
+				continue
+			pending[filepath] = { "hash" : digest, "size" : stat.st_size, "mtime" : stat.st_mtime_ns }
+		return pending
+
+	def record(self, filepath, info):
+		entry = { "file" : os.path.basename(filepath), "fingerprint" : self.fingerprint }
+		entry.update(info)
+		self.entries[entry["file"]] = entry
+		with open(self.path, "a", encoding = "utf8") as f:
+			f.write(json.dumps(entry, ensure_ascii = False) + "\n")
+			f.flush()
+			os.fsync(f.fileno())
+
+def simplify_file(simplifier, filepath, outdir, subs_format = "tsv", compress = False):
+	"""Simplifies the file and writes the simplified text and the substitutions (in the subs_format "tsv" or "jsonl")"""
+	stats = simplifier.statistics
+	if stats is not None:
+		start = time.perf_counter()
+	text = io_helper.load_file(filepath)
+	if stats is not None:
+		stats.add_time("input", time.perf_counter() - start)
+	simp_text, subs = simplifier.simplify_text(text)
+	if stats is not None:
+		start = time.perf_counter()
+	# the outputs are written into temporary files and renamed, so that an interrupted run never leaves partially written outputs
+	text_path, subs_path = output_paths(filepath, outdir, compress)
+	io_helper.write_list(text_path + ".part", [simp_text], compress = compress)
+	if subs_format == "jsonl":
+		io_helper.write_jsonl(subs_path + ".part", substitution_records(subs), compress = compress)
+	else:
+		io_helper.write_list_tuples_separated(subs_path + ".part", [s[:3] for s in subs], compress = compress)
+	os.replace(text_path + ".part", text_path)
+	os.replace(subs_path + ".part", subs_path)
+	if stats is not None:
+		stats.add_time("output", time.perf_counter() - start)
+
+def simplify_file_in_worker(job):
+	filepath, outdir, subs_format, compress = job
+	simplify_file(worker_simplifier, filepath, outdir, subs_format, compress)
+	stats = worker_simplifier.statistics.to_dict() if worker_simplifier.statistics is not None else None
+	dedup = (worker_simplifier.deduplicator.units, worker_simplifier.deduplicator.repeated) if worker_simplifier.deduplicator is not None else None
+	return filepath, os.getpid(), worker_simplifier.cache_hits, worker_simplifier.cache_misses, stats, dedup
+
+def simplify_files(simplifier, filepaths, outdir, num_workers = 1, print_progress = True, manifest = None, subs_format = "tsv", compress = False):
+	"""Simplifies the files into the output directory, in a pool of forked processes with more than one worker (and only the new and changed files with a manifest)"""
+	if manifest is not None:
+		pending = manifest.pending(filepaths)
+		if print_progress:
+			print("Files already simplified with the same settings (skipped): " + str(len(filepaths) - len(pending)) + "/" + str(len(filepaths)))
+		filepaths = [fp for fp in filepaths if fp in pending]
+
+	if num_workers <= 1:
+		for i in range(len(filepaths)):
+			if print_progress:
+				print("Simplifying text in file: " + os.path.basename(filepaths[i]) + "(" + str(i+1) + "/" + str(len(filepaths)) + ")")
+			simplify_file(simplifier, filepaths[i], outdir, subs_format, compress)
+			if manifest is not None:
+				manifest.record(filepaths[i], pending[filepaths[i]])
+		return
+
+	global worker_simplifier
+	worker_simplifier = simplifier
+	context = multiprocessing.get_context("fork")
+	chunksize = max(1, min(100, len(filepaths) // (num_workers * 16)))
+	# the (cumulative) cache, run statistics and deduplication counters of each worker, added to those of the parent simplifier at the end
+	worker_cache_stats = {}
+	worker_run_stats = {}
+	worker_dedup_stats = {}
+	with context.Pool(num_workers) as pool:
+		for i, (filepath, pid, hits, misses, stats, dedup) in enumerate(pool.imap_unordered(simplify_file_in_worker, [(fp, outdir, subs_format, compress) for fp in filepaths], chunksize = chunksize)):
+			worker_cache_stats[pid] = (hits, misses)
+			worker_run_stats[pid] = stats
+			worker_dedup_stats[pid] = dedup
+			if manifest is not None:
+				manifest.record(filepath, pending[filepath])
+			if print_progress:
+				print("Simplified text in file: " + os.path.basename(filepath) + "(" + str(i+1) + "/" + str(len(filepaths)) + ")")
+	worker_simplifier = None
+	simplifier.cache_hits += sum(x[0] for x in worker_cache_stats.values())
+	simplifier.cache_misses += sum(x[1] for x in worker_cache_stats.values())
+	if simplifier.statistics is not None:
+		for stats in worker_run_stats.values():
+			simplifier.statistics.merge(stats)
+	if simplifier.deduplicator is not None:
+		simplifier.deduplicator.units += sum(x[0] for x in worker_dedup_stats.values())
+		simplifier.deduplicator.repeated += sum(x[1] for x in worker_dedup_stats.values())
+
+def iterate_documents(source, data_format = "lines"):
+	"""Lazily reads the documents (dictionaries with the field "text") from the files of a directory or the lines of a file or of the standard input"""
+	if source != "-" and os.path.isdir(source):
+		for filename, text in io_helper.iterate_files(source):
+			yield { "id" : filename, "text" : text }
+	else:
+		for line in io_helper.iterate_lines(source):
+			if data_format == "jsonl":
+				if line != "":
+					yield json.loads(line)
+			else:
+				yield { "text" : line }
+
+def simplify_stream(simplifier, documents, text_output, subs_output = None, data_format = "lines", subs_format = "tsv"):
+	"""Simplifies the documents one by one and writes each result as soon as it is computed"""
+	cnt = 0
+	stats = simplifier.statistics
+	for i, doc in enumerate(documents):
+		simp_text, subs = simplifier.simplify_text(doc["text"])
+		if stats is not None:
+			start = time.perf_counter()
+		if data_format == "jsonl":
+			record = dict(doc)
+			record["text"] = simp_text
+			record["substitutions"] = substitution_records(subs)
+			text_output.write(json.dumps(record, ensure_ascii = False) + "\n")
+		else:
+			text_output.write(simp_text + "\n")
+			if subs_output is not None and subs_format == "jsonl":
+				subs_output.write("".join(json.dumps(r, ensure_ascii = False) + "\n" for r in substitution_records(subs, i)))
+			elif subs_output is not None:
+				subs_output.write("".join(str(i) + "\t" + "\t".join([str(x) for x in s[:3]]) + "\n" for s in subs))
+		if stats is not None:
+			stats.add_time("output", time.perf_counter() - start)
+		cnt += 1
+	return cnt
+
@@ -0,0 +1,86 @@
+import hashlib
+import re
+from collections import OrderedDict
+
+# a token ending a sentence: ends with a full stop, question or exclamation mark, possibly followed by closing quotes or brackets
+SENTENCE_END = re.compile(r"[.!?][\"'”’)\]]*$")
+PARAGRAPH_SEPARATOR = re.compile(r"\n\s*\n")
+
+def split_sentences(text):
+	units = []
+	tokens = []
+	for token in text.split():
+		tokens.append(token)
+		if SENTENCE_END.search(token):
+			units.append(tokens)
+			tokens = []
+	if len(tokens) > 0:
+		units.append(tokens)
+	return units
+
+def split_paragraphs(text):
+	return [tokens for tokens in (p.split() for p in PARAGRAPH_SEPARATOR.split(text)) if len(tokens) > 0]
+
+class UnitDeduplicator(object):
+	"""
+	Splits the texts into units (sentences or paragraphs) and simplifies each distinct unit only once: the results of the units are kept in a table
+	of at most max_units entries (keyed by a hash of the unit and of the simplification parameters, least recently used entries are evicted first)
+	and reused for the repeated units, e.g., the boilerplate of crawled or templated documents. The simplified units are joined as the tokens of a
+	whole text would be and the token indices (and character offsets) of the substitutions are shifted to the positions of the units in the text. Note that the context
+	of a target word is then limited to its unit.
+	"""
+
+	def __init__(self, unit = "sentence", max_units = 100000):
+		if unit not in ["sentence", "paragraph"]:
+			raise ValueError("Unknown deduplication unit: " + str(unit))
+		self.split = split_sentences if unit == "sentence" else split_paragraphs
+		self.max_units = max_units
+		self.table = OrderedDict()
+		self.units = 0
+		self.repeated = 0
+
+	def unit_key(self, parameters_key, tokens):
+		return hashlib.blake2b((parameters_key + "\n" + " ".join(tokens)).encode("utf8"), digest_size = 16).digest()
+
+	def simplify_batch(self, simplifier, texts):
+		parameters_key = repr(sorted(simplifier.params.items()))
+		texts_units = [[(self.unit_key(parameters_key, tokens), tokens) for tokens in self.split(text)] for text in texts]
+		missing = OrderedDict()
+		for units in texts_units:
+			for key, tokens in units:
+				self.units += 1
+				if key in self.table:
+					self.table.move_to_end(key)
+					self.repeated += 1
+				elif key in missing:
+					self.repeated += 1
+				else:
+					missing[key] = tokens
+
+		computed = dict(zip(missing, simplifier.simplify_tokenized(list(missing.values()))))
+		results = []
+		for units in texts_units:
+			parts = []
+			substitutions = []
+			offset = 0
+			char_offset = 0
+			for key, tokens in units:
+				simp_text, subs = computed[key] if key in computed else self.table[key]
+				parts.append(simp_text)
+				substitutions.extend((s[0] + offset, s[1], s[2], s[3] + char_offset, s[4] + char_offset) + s[5:] for s in subs)
+				offset += len(tokens)
+				char_offset += len(simp_text) + 1
+			results.append((" ".join(parts), substitutions))
+
+		for key in computed:
+			self.table[key] = computed[key]
+			if len(self.table) > self.max_units:
+				self.table.popitem(last = False)
+		if simplifier.statistics is not None:
+			simplifier.statistics.count("units", sum(len(units) for units in texts_units))
+			simplifier.statistics.count("units_repeated", sum(len(units) for units in texts_units) - len(missing))
+		return results
+
+	def dedup_ratio(self):
+		"""Share of the units whose simplification was reused."""
+		return self.repeated / float(self.units) if self.units > 0 else 0.0
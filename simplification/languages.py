@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from simplification import lightls
+from simplification import complexity
+from simplification import lexicon
+from simplification import vocabulary
+from helpers import io_helper
+from embeddings import text_embeddings
+from embeddings import ann_index
+
+# the options of the model of a language (named as the corresponding options of server.py), with their default values
+DEFAULT_OPTIONS = { "wordfreqs" : None, "embs" : None, "stopwords" : None, "lexicon" : None, "annindex" : None, "nprobe" : 8, "limit" : 200000, "prune" : False, "budgettargets" : 100000, "budgetcandidates" : 30000, "budgetcontext" : 50000, "quantize" : None, "tholdcmplx" : 0.2, "numcands" : 10, "tholdsim" : 0.55, "dropcmplx" : 0.03, "window" : 5 }
+PATH_OPTIONS = ["wordfreqs", "embs", "stopwords", "lexicon", "annindex"]
+
+def language_options(options, defaults = None):
+	"""The options of a language, completed with the defaults (and then with DEFAULT_OPTIONS)."""
+	merged = dict(DEFAULT_OPTIONS)
+	merged.update(defaults or {})
+	merged.update(options)
+	return merged
+
+def check_options(language, options):
+	"""Raises a ValueError if the files of the model of the language are not given or do not exist."""
+	if options["lexicon"] and not os.path.isfile(options["lexicon"]):
+		raise ValueError("File containing the substitution lexicon not found (language " + language + ").")
+	if not options["lexicon"] and (not options["embs"] or not os.path.isfile(options["embs"])):
+		raise ValueError("File containing pre-trained word embeddings not found (language " + language + ").")
+	if not options["wordfreqs"] or not os.path.isfile(options["wordfreqs"]):
+		raise ValueError("File containing word frequencies (pre-computed from a large corpus) not found (language " + language + ").")
+	if options["stopwords"] and not os.path.isfile(options["stopwords"]):
+		raise ValueError("File containing the stopwords not found (language " + language + ").")
+	if options["annindex"] and not os.path.isfile(options["annindex"]):
+		raise ValueError("File containing the approximate nearest-neighbour index not found (language " + language + ").")
+
+def load_config(path, defaults = None):
+	"""Loads the JSON configuration mapping each language to its options (see DEFAULT_OPTIONS), with paths relative to the configuration file"""
+	with open(path, encoding = "utf8") as f:
+		config = json.load(f, object_pairs_hook = OrderedDict)
+	if not isinstance(config, dict) or len(config) == 0 or not all(isinstance(o, dict) for o in config.values()):
+		raise ValueError("The language configuration needs to be a (non-empty) JSON object mapping languages to their options.")
+	directory = os.path.dirname(os.path.abspath(path))
+	configs = OrderedDict()
+	for language, options in config.items():
+		unknown = [o for o in options if o not in DEFAULT_OPTIONS]
+		if len(unknown) > 0:
+			raise ValueError("Unknown options of the language " + language + ": " + ", ".join(unknown))
+		options = dict(options)
+		for o in PATH_OPTIONS:
+			if options.get(o):
+				options[o] = os.path.join(directory, options[o])
+		configs[language] = language_options(options, defaults)
+		check_options(language, configs[language])
+	return configs
+
+def load_simplifier(language, options, embeddings, cache_size = 0, statistics = None, print_loading = False):
+	"""Loads the model of the language (into the shared Embeddings, unless a lexicon is used) and creates its simplifier"""
+	complexities = complexity.ComplexityTable.load(options["wordfreqs"])
+	stopwords = io_helper.load_lines(options["stopwords"]) if options["stopwords"] else None
+	parameters = {"complexity_drop_threshold" : options["dropcmplx"], "num_cand" : options["numcands"], "similarity_threshold" : options["tholdsim"], "context_window_size" : options["window"], "complexity_threshold" : options["tholdcmplx"]}
+
+	lex = None
+	if options["lexicon"]:
+		lex = lexicon.SubstitutionLexicon.load(options["lexicon"])
+		embeddings = lex.to_embeddings(language)
+	else:
+		vocabulary_filter = None
+		if options["prune"]:
+			vocabulary_filter = vocabulary.select_vocabulary(complexities, stopwords, options["tholdcmplx"], max_targets = options["budgettargets"], max_candidates = options["budgetcandidates"], max_context = options["budgetcontext"])
+			if print_loading:
+				print("Words selected for the pruned vocabulary: " + str(len(vocabulary_filter)))
+		if io_helper.is_binary_embeddings(options["embs"]):
+			embeddings.load_embeddings_binary(options["embs"], language = language, vocabulary_filter = vocabulary_filter, print_loading = print_loading)
+		else:
+			embeddings.load_embeddings(options["embs"], options["limit"], language = language, print_loading = print_loading, skip_first_line = True, normalize = True, vocabulary_filter = vocabulary_filter)
+		embeddings.inverse_vocabulary(language)
+		if options["prune"] and print_loading:
+			print("Share of corpus tokens (according to the word frequencies) covered by the embeddings vocabulary: " + str(round(100 * vocabulary.frequency_coverage(complexities, embeddings.lang_vocabularies[language]), 2)) + "%")
+		if options["quantize"]:
+			memory_before = embeddings.memory_usage(language)
+			embeddings.quantize(language, options["quantize"])
+			if print_loading:
+				print("Embeddings quantised to " + options["quantize"] + ": " + str(round(memory_before / 1048576.0, 1)) + " MB -> " + str(round(embeddings.memory_usage(language) / 1048576.0, 1)) + " MB")
+		if options["annindex"]:
+			embeddings.set_ann_index(language, ann_index.IVFIndex.load(options["annindex"], nprobe = options["nprobe"]))
+	if statistics is not None:
+		embeddings.statistics = statistics
+	return lightls.LightLS(embeddings, complexities, parameters, stopwords, lang = language, lexicon = lex, cache_size = cache_size, statistics = statistics)
+
+def memory_usage(simplifier):
+	"""Approximate number of bytes of the model of a simplifier: its embedding arrays (memory-mapped ones at their full size) and complexity table arrays."""
+	return simplifier.embeddings.memory_usage(simplifier.lang) + simplifier.complexities.frequencies.nbytes + simplifier.complexities.complexities.nbytes
+
+class LanguageModels(object):
+	"""Simplifiers of several languages, loaded on first use and unloaded (least recently used first) to stay within the memory budget"""
+
+	def __init__(self, configs = None, memory_budget = None, cache_size = 0, statistics = None, print_loading = False, max_parameter_sets = 64):
+		self.configs = OrderedDict(configs or {})
+		self.memory_budget = memory_budget
+		self.cache_size = cache_size
+		self.statistics = statistics
+		self.print_loading = print_loading
+		self.max_parameter_sets = max_parameter_sets
+		self.embeddings = text_embeddings.Embeddings()
+		# loaded simplifiers, from the least to the most recently used language
+		self.simplifiers = OrderedDict()
+		# simplifiers with overridden parameters, per language (dropped together with the language)
+		self.variants = {}
+		# memory of the models (kept after unloading, so that room is made before a model is loaded again)
+		self.memory = {}
+		self.loads = {}
+		# languages are loaded from within the request handling, possibly from several threads
+		self.lock = threading.RLock()
+
+	def languages(self):
+		return list(self.configs) + [l for l in self.simplifiers if l not in self.configs]
+
+	def default_language(self):
+		return self.languages()[0]
+
+	def is_loaded(self, language):
+		return language in self.simplifiers
+
+	def add(self, language, simplifier):
+		# a simplifier added already loaded has no configuration to be reloaded from and is never unloaded
+		with self.lock:
+			self.simplifiers[language] = simplifier
+			self.memory[language] = memory_usage(simplifier)
+
+	def get(self, language, parameters = ()):
+		"""The simplifier of the language (loaded if needed) for the parameter overrides, given as a sorted tuple of (name, value) pairs."""
+		with self.lock:
+			if language not in self.simplifiers:
+				if language not in self.configs:
+					raise ValueError("Unknown language: " + str(language))
+				self.load(language)
+			self.simplifiers.move_to_end(language)
+			simplifier = self.simplifiers[language]
+			if len(parameters) == 0:
+				return simplifier
+			variants = self.variants.setdefault(language, {})
+			if parameters not in variants:
+				if len(variants) >= self.max_parameter_sets:
+					variants.clear()
+				variants[parameters] = simplifier.with_parameters(dict(parameters))
+			return variants[parameters]
+
+	def load(self, language):
+		with self.lock:
+			self.make_room(self.memory.get(language, 0), keep = language)
+			if self.print_loading:
+				print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Loading the model of the language " + language + "...", flush = True)
+			simplifier = load_simplifier(language, self.configs[language], self.embeddings, cache_size = self.cache_size, statistics = self.statistics, print_loading = self.print_loading)
+			self.simplifiers[language] = simplifier
+			self.memory[language] = memory_usage(simplifier)
+			self.loads[language] = self.loads.get(language, 0) + 1
+			self.make_room(0, keep = language)
+			if self.print_loading:
+				print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Model of the language " + language + " loaded (" + str(round(self.memory[language] / 1048576.0, 1)) + " MB).", flush = True)
+
+	def unload(self, language):
+		with self.lock:
+			simplifier = self.simplifiers.pop(language)
+			self.variants.pop(language, None)
+			if simplifier.embeddings is self.embeddings:
+				self.embeddings.unload(language)
+			if self.print_loading:
+				print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Model of the language " + language + " unloaded.", flush = True)
+
+	def make_room(self, size, keep = None):
+		"""Unloads the least recently used (configured) languages until the given number of bytes fits into the memory budget."""
+		if self.memory_budget is None:
+			return
+		for language in list(self.simplifiers):
+			if self.loaded_memory() + size <= self.memory_budget:
+				break
+			if language != keep and language in self.configs:
+				self.unload(language)
+
+	def loaded_memory(self):
+		return sum(self.memory[l] for l in self.simplifiers)
+
+	def status(self):
+		"""Per language: whether its model is loaded, its (approximate) memory, the number of times it was loaded and its candidate cache statistics."""
+		simplifiers = dict(self.simplifiers)
+		status = OrderedDict()
+		for language in self.languages():
+			status[language] = { "loaded" : language in simplifiers, "memory_mb" : round(self.memory.get(language, 0) / 1048576.0, 1), "loads" : self.loads.get(language, 0) }
+			if language in simplifiers:
+				status[language]["cache"] = simplifiers[language].cache_statistics()
+		return status
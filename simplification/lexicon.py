@@ -0,0 +1,110 @@
+import json
+import numpy as np
+from embeddings import text_embeddings
+from helpers import io_helper
+
+class SubstitutionLexicon(object):
+	"""
+	Precomputed context-independent part of the simplification: for each target word, the simpler candidate replacements
+	(with their "sim" and "complexity_drop" features) and the vectors of the candidate (and, optionally, context) words
+	"""
+
+	# parameters which determine the content of the lexicon
+	build_parameters = ["num_cand", "complexity_threshold", "complexity_drop_threshold"]
+
+	def __init__(self, parameters, targets, offsets, candidate_ids, sims, drops, words, vectors, norms):
+		self.parameters = parameters
+		self.targets = {w : i for i, w in enumerate(targets)}
+		self.offsets = offsets
+		self.candidate_ids = candidate_ids
+		self.sims = sims
+		self.drops = drops
+		self.words = words
+		self.vectors = vectors
+		self.norms = norms
+
+	def __contains__(self, target):
+		return target in self.targets
+
+	def __len__(self):
+		return len(self.targets)
+
+	def get_candidates(self, target, complexity_drop_threshold = None):
+		"""Returns the simpler candidates of the target word (in the order of similarity), with the features, or None if there are none."""
+		if target not in self.targets:
+			return None
+		t = self.targets[target]
+		candidates = {}
+		for j in range(self.offsets[t], self.offsets[t + 1]):
+			if complexity_drop_threshold is None or self.drops[j] >= complexity_drop_threshold:
+				candidates[self.words[self.candidate_ids[j]]] = { "complexity_drop" : float(self.drops[j]), "sim" : self.sims[j] }
+		return candidates
+
+	def check_parameters(self, parameters):
+		"""The lexicon can serve stricter complexity thresholds than the ones it was built with, but not looser ones."""
+		if parameters["num_cand"] != self.parameters["num_cand"]:
+			raise ValueError("The lexicon was built with num_cand = " + str(self.parameters["num_cand"]) + " and cannot be used with num_cand = " + str(parameters["num_cand"]))
+		for p in ["complexity_threshold", "complexity_drop_threshold"]:
+			if parameters[p] < self.parameters[p]:
+				raise ValueError("The lexicon was built with " + p + " = " + str(self.parameters[p]) + " and cannot be used with a lower value (" + str(parameters[p]) + ")")
+
+	def to_embeddings(self, lang = "default"):
+		"""Embeddings containing only the words of the lexicon (candidates and context words), sufficient for computing the context features."""
+		embeddings = text_embeddings.Embeddings()
+		embeddings.lang_vocabularies[lang] = {w : i for i, w in enumerate(self.words)}
+		embeddings.lang_embeddings[lang] = self.vectors
+		embeddings.lang_emb_norms[lang] = self.norms
+		embeddings.emb_sizes[lang] = self.vectors.shape[1]
+		return embeddings
+
+	@staticmethod
+	def build(simplifier, words, context_words = None, batch_size = 1000, print_progress = False):
+		"""
+		Runs the candidate search and filtering of the (fully loaded) simplifier for each of the given words which qualifies as a target
+		word. Vectors are stored for all candidate words and for the given context words.
+		"""
+		targets = []
+		target_set = set()
+		offsets = [0]
+		candidates = []
+		sims = []
+		drops = []
+		word_ids = {}
+
+		eligible = simplifier.select_targets(simplifier.intern_tokens(words))[1]
+		for start in range(0, len(eligible), batch_size):
+			if print_progress:
+				print("Building lexicon entries: " + str(start) + "/" + str(len(eligible)))
+			batch = eligible[start : start + batch_size]
+			for t, simpler in zip(batch, simplifier.get_simpler_candidates(batch)):
+				if len(simpler) == 0 or t[0] in target_set:
+					continue
+				targets.append(t[0])
+				target_set.add(t[0])
+				for c in simpler:
+					if c not in word_ids:
+						word_ids[c] = len(word_ids)
+					candidates.append(word_ids[c])
+					sims.append(simpler[c]["sim"])
+					drops.append(simpler[c]["complexity_drop"])
+				offsets.append(len(candidates))
+
+		for w in (context_words if context_words is not None else []):
+			if w not in word_ids and simplifier.embeddings.get_vector(simplifier.lang, w) is not None:
+				word_ids[w] = len(word_ids)
+
+		lexicon_words = sorted(word_ids, key = lambda w: word_ids[w])
+		vectors = np.array([simplifier.embeddings.get_vector(simplifier.lang, w) for w in lexicon_words], dtype = np.float32).reshape((len(lexicon_words), simplifier.embeddings.emb_sizes[simplifier.lang]))
+		norms = np.array([simplifier.embeddings.get_norm(simplifier.lang, w) for w in lexicon_words], dtype = np.float32)
+		parameters = {p : simplifier.params[p] for p in SubstitutionLexicon.build_parameters}
+		return SubstitutionLexicon(parameters, targets, np.array(offsets, dtype = np.int64), np.array(candidates, dtype = np.int32), np.array(sims, dtype = np.float32), np.array(drops, dtype = np.float64), lexicon_words, vectors, norms)
+
+	def store(self, path):
+		targets = sorted(self.targets, key = lambda w: self.targets[w])
+		with open(path, "wb") as f:
+			np.savez(f, parameters = io_helper.encode_words([json.dumps(self.parameters)]), targets = io_helper.encode_words(targets), offsets = self.offsets, candidate_ids = self.candidate_ids, sims = self.sims, drops = self.drops, words = io_helper.encode_words(self.words), vectors = self.vectors, norms = self.norms)
+
+	@staticmethod
+	def load(path):
+		data = np.load(path)
+		return SubstitutionLexicon(json.loads(io_helper.decode_words(data["parameters"])[0]), io_helper.decode_words(data["targets"]), data["offsets"], data["candidate_ids"], data["sims"], data["drops"], io_helper.decode_words(data["words"]), data["vectors"], data["norms"])
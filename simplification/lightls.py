@@ -1,141 +1,390 @@
-import math
+import copy
+import itertools
+import time
+from collections import OrderedDict
 import numpy as np
 from helpers import string_helper
+from simplification.complexity import ComplexityTable
+from embeddings.text_embeddings import TOP_K_BLOCK_ELEMENTS
+
+class InternedText(object):
+	"""
+	Tokens of a text, each resolved once into its stripped form, embedding row (-1 if neither the form nor its lowercased variant has a vector), 
+	complexity and flags (proper name or number, stopword), stored in arrays parallel to the tokens.
+	"""
+	def __init__(self, tokens, forms, ids, complexities, names, stopwords):
+		self.tokens = tokens
+		self.forms = forms
+		self.ids = ids
+		self.complexities = complexities
+		self.names = names
+		self.stopwords = stopwords
+
+	def __len__(self):
+		return len(self.tokens)
+
+# characters stripped from (and restored to) the beginning and the end of tokens
+PUNCTUATION = [".", ",", "!", ":", "?", ";", "-", ")", "(", "[", "]", "{", "}", "...", "/", "\\", "''", "\"", "'"]
+
+# fields of the substitutions: token index, original word, replacement, character offsets of the replacement in the simplified text and the
+# similarity and complexity drop of the replacement
+SUBSTITUTION_FIELDS = ["index", "original", "replacement", "start", "end", "similarity", "complexity_drop"]
 
 class LightLS(object):
 	"""description of class"""
-	def __init__(self, embeddings, word_freqs, parameters, stopwords = None, lang = "default"):
-		self.stopwords = stopwords
+	def __init__(self, embeddings, word_freqs, parameters, stopwords = None, lang = "default", lexicon = None, cache_size = 0, statistics = None, deduplicator = None):
+		self.stopwords = set(stopwords) if stopwords is not None else None
 		self.params = parameters
 		self.embeddings = embeddings
 		self.lang = lang
+		self.lexicon = lexicon
+		# LRU cache of the (context-independent) simpler candidates of target words
+		self.cache_size = cache_size
+		self.candidate_cache = OrderedDict()
+		self.cache_hits = 0
+		self.cache_misses = 0
+		# simplifier whose cache (and cache counters) this one shares, for the simplifiers created with with_parameters
+		self.parent = None
+		# optional RunStatistics, into which the stage timings and the reasons for not simplifying tokens are recorded
+		self.statistics = statistics
+		# optional dedup.UnitDeduplicator, simplifying each distinct sentence (or paragraph) only once
+		self.deduplicator = deduplicator
+		if lexicon is not None:
+			lexicon.check_parameters(parameters)
 		
-		self.complexities = {x : 1.0 / math.log2(word_freqs[x] + 2) for x in word_freqs }
-		max_freq = max(word_freqs.values())
-		min_freq = min(word_freqs.values())
-		min_complexity = 1.0 / math.log2(max_freq + 2)
-		max_complexity = 1.0 / math.log2(min_freq + 2)
-		self.complexities = {x : (self.complexities[x] - min_complexity) / (max_complexity - min_complexity) for x in self.complexities}		
+		# word frequencies are given either as a ComplexityTable or as a dictionary
+		self.complexities = word_freqs if isinstance(word_freqs, ComplexityTable) else ComplexityTable.from_dict(word_freqs)
 
 	def fix_token(self, token):
-		punctuation = [".", ",", "!", ":", "?", ";", "-", ")", "(", "[", "]", "{", "}", "...", "/", "\\", "''", "\"", "'"]
-		if token[0] in punctuation and token[-1] in punctuation:	
+		if token[0] in PUNCTUATION and token[-1] in PUNCTUATION:	
 			return token[1:-1]
-		elif token[0] in punctuation:
+		elif token[0] in PUNCTUATION:
 			return token[1:]
-		elif token[-1] in punctuation:
+		elif token[-1] in PUNCTUATION:
 			return token[:-1]
 		else:
 			return token
 
 	def fix_token_inverse(self, token, simp_token):
-		punctuation = [".", ",", "!", ":", "?", ";", "-", ")", "(", "[", "]", "{", "}", "...", "/", "\\", "''", "\"", "'"]
-		if token[0] in punctuation and token[-1] in punctuation:	
+		if token[0] in PUNCTUATION and token[-1] in PUNCTUATION:	
 			return token[0] + simp_token + token[-1]
-		elif token[0] in punctuation:
+		elif token[0] in PUNCTUATION:
 			return token[0] + simp_token
-		elif token[-1] in punctuation:
+		elif token[-1] in PUNCTUATION:
 			return simp_token + token[-1]
 		else:
 			return simp_token
 			
 	def simplify_text(self, text):
-		simplifications = []
-		tokens = text.split()
-		for i in range(len(tokens)):
-			res = self.try_simplify_token(tokens, i)
+		return self.simplify_batch([text])[0]
+
+	def simplify_batch(self, texts):
+		"""Simplifies several texts at once, with one (batched) search for candidates for the target words of all the texts."""
+		if self.statistics is not None:
+			self.statistics.count("documents", len(texts))
+		if self.deduplicator is not None:
+			return self.deduplicator.simplify_batch(self, texts)
+		return self.simplify_tokenized([text.split() for text in texts])
+
+	def simplify_tokenized(self, token_lists):
+		"""Simplifies several texts, given as lists of (whitespace-separated) tokens; the substitutions refer to the token indices."""
+		stats = self.statistics
+		if stats is not None:
+			start = time.perf_counter()
+		# distinct tokens are resolved only once for the whole batch
+		resolved = {}
+		interned = [self.intern_tokens(tokens, resolved) for tokens in token_lists]
+		positions = []
+		targets = []
+		for t in range(len(interned)):
+			indices, text_targets = self.select_targets(interned[t])
+			positions.extend((t, i) for i in indices)
+			targets.extend(text_targets)
+		if stats is not None:
+			stats.add_time("target_selection", time.perf_counter() - start)
+		simpler_candidates = self.get_simpler_candidates(targets)
+
+		if stats is not None:
+			start = time.perf_counter()
+		simplifications = [[] for text in interned]
+		for (t, i), cands, res in zip(positions, simpler_candidates, self.choose_candidates(interned, positions, simpler_candidates)):
 			if res:
-				simplifications.append((i, res))
-		
+				simplifications[t].append((i, res, float(cands[res]["sim"]), float(cands[res]["complexity_drop"])))
+		if stats is not None:
+			stats.add_time("ranking", time.perf_counter() - start)
+		return [self.apply_simplifications(text, simps) for text, simps in zip(interned, simplifications)]
+
+	def apply_simplifications(self, text, simplifications):
+		"""
+		Replaces the target tokens with the chosen (token index, replacement, similarity, complexity drop) simplifications. Returns the simplified
+		text and the substitutions (see SUBSTITUTION_FIELDS).
+		"""
 		tokens_simple = []
-		tokens_simple.extend(tokens)
-		replacements = []
+		tokens_simple.extend(text.tokens)
 		for s in simplifications:
-			tokens_simple[s[0]] = self.fix_token_inverse(tokens[s[0]], s[1])
-			replacements.append((s[0], self.fix_token(tokens[s[0]]), s[1]))
+			tokens_simple[s[0]] = self.fix_token_inverse(text.tokens[s[0]], s[1])
+		replacements = []
+		if len(simplifications) > 0:
+			# character offsets of the tokens in the simplified text (joined with single spaces)
+			token_starts = [0]
+			token_starts.extend(itertools.accumulate(len(t) + 1 for t in tokens_simple))
+			for s in simplifications:
+				start = token_starts[s[0]] + (1 if text.tokens[s[0]][0] in PUNCTUATION else 0)
+				replacements.append((s[0], text.forms[s[0]], s[1], start, start + len(s[1])) + tuple(s[2:]))
 		simplified_text = ' '.join(tokens_simple)
 		return (simplified_text, replacements)
+
+	def with_parameters(self, parameters):
+		"""
+		A simplifier with (some of) the parameters overridden, sharing the embeddings, complexities, lexicon and candidate cache (with its hit
+		and miss counters) with this one (cache entries are keyed by the parameters they depend on).
+		"""
+		simplifier = copy.copy(self)
+		simplifier.params = dict(self.params)
+		simplifier.params.update(parameters)
+		simplifier.parent = self if self.parent is None else self.parent
+		if self.lexicon is not None:
+			self.lexicon.check_parameters(simplifier.params)
+		return simplifier
+
+	def resolve_tokens(self, tokens):
+		"""Resolves the tokens into (form, embedding row, complexity, name, stopword) records; the complexities are gathered from the table in one batch."""
+		forms = [self.fix_token(t) for t in tokens]
+		lowers = [f.lower() for f in forms]
+		vocabulary = self.embeddings.lang_vocabularies[self.lang]
+		rows = [vocabulary.get(f, vocabulary.get(l, -1)) for f, l in zip(forms, lowers)]
+		ids = self.complexities.get_ids(forms)
+		missing = np.flatnonzero(ids < 0)
+		if len(missing) > 0:
+			ids[missing] = self.complexities.get_ids([lowers[i] for i in missing])
+		# as with ComplexityTable.get, the words not in the frequency list are the most complex ones
+		complexities = self.complexities.get_complexities(ids, default = 1.0).tolist()
+		return [(f, r, c, str.isupper(f) or str.istitle(f) or str.isnumeric(f), self.stopwords is not None and l in self.stopwords) for f, l, r, c in zip(forms, lowers, rows, complexities)]
+
+	def resolve_token(self, token):
+		return self.resolve_tokens([token])[0]
+
+	def intern_tokens(self, tokens, resolved = None):
+		"""Resolves the tokens (of a text) into an InternedText. Tokens already in the dictionary resolved (e.g., shared across a batch) are not resolved again."""
+		resolved = {} if resolved is None else resolved
+		new_tokens = [t for t in dict.fromkeys(tokens) if t not in resolved]
+		if len(new_tokens) > 0:
+			resolved.update(zip(new_tokens, self.resolve_tokens(new_tokens)))
+		records = [resolved[t] for t in tokens]
+		forms, ids, complexities, names, stopwords = zip(*records) if len(records) > 0 else ([], [], [], [], [])
+		return InternedText(tokens, list(forms), np.array(ids, dtype = np.int64), np.array(complexities, dtype = np.float64), np.array(names, dtype = bool), np.array(stopwords, dtype = bool))
 			
 	def try_simplify_token(self, tokens, index):
-		target = self.fix_token(tokens[index])
-		# Not simplifying proper names
-		if str.isupper(target) or str.istitle(target) or str.isnumeric(target):
-			return None
-		complexity_target = self.complexities[target] if target in self.complexities else (self.complexities[target.lower()] if target.lower() in self.complexities else 1.0)
-		# If the word is simple enough, no need to consider replacing it
-		if complexity_target <= self.params["complexity_threshold"]:
+		text = self.intern_tokens(tokens)
+		target = self.select_target(text, index)
+		if target is None:
 			return None
+		return self.choose_candidate(text, index, self.get_simpler_candidates([target])[0])
 
-		# we're not "simplifying" stopwords
-		if self.stopwords and target.lower() in self.stopwords:
-			return None
+	def select_target(self, text, index):
+		"""Returns the (target word, complexity, vector) triple if the token of the (interned) text is to be considered for simplification, None otherwise."""
+		indices, targets = self.select_targets(text, [index])
+		return targets[0] if len(targets) > 0 else None
+
+	def select_targets(self, text, indices = None):
+		"""The indices of the tokens of the (interned) text to be considered for simplification (among the given ones, all by default) and their target triples."""
+		indices = np.arange(len(text)) if indices is None else np.array(indices, dtype = np.int64)
+		# not simplifying proper names, words which are simple enough and stopwords
+		eligible = ~(text.names[indices] | text.stopwords[indices]) & (text.complexities[indices] > self.params["complexity_threshold"])
+		if self.statistics is not None:
+			self.count_skipped(text, indices, eligible)
+		# with a precomputed lexicon, the target vector is not needed (nor available)
+		if self.lexicon is not None:
+			indices = [i for i in indices[eligible].tolist() if text.forms[i] in self.lexicon or text.forms[i].lower() in self.lexicon]
+			if self.statistics is not None:
+				self.statistics.count("skipped_oov", int(eligible.sum()) - len(indices))
+			return indices, [(text.forms[i], float(text.complexities[i]), None) for i in indices]
+
+		if self.statistics is not None:
+			self.statistics.count("skipped_oov", int((eligible & (text.ids[indices] < 0)).sum()))
+		indices = indices[eligible & (text.ids[indices] >= 0)]
+		vectors = self.embeddings.get_rows(self.lang, text.ids[indices])
+		indices = indices.tolist()
+		return indices, [(text.forms[i], float(text.complexities[i]), v) for i, v in zip(indices, vectors)]
 
-		tvec = self.embeddings.get_vector(self.lang, target)
-		if tvec is None:
-			tvec = self.embeddings.get_vector(self.lang, target.lower())
-		if tvec is not None:
-			candidates = self.embeddings.most_similar_fast_cosine(tvec, self.lang, num = self.params["num_cand"], without_first = True)
-			simpler_candidates = {}
-			for c in candidates:
-				# we discard candidates that are derivational morphological variations of the target word
-				if c in target or target in c:
-					continue
-				lcses = string_helper.longest_common_subsequence(c, target)
-				if len(lcses) > 0:
-					lcs = lcses.pop()
-					if len(target) >= 6 and len(c) >= 6 and len(lcs) >= (min(len(c), len(target)) - 3):
-						continue
-				# don't allow the target word to be replaced by a stopword
-				if self.stopwords is not None and c.lower() in self.stopwords:
-					continue
-
-				complexity_cand = self.complexities[c] if c in self.complexities else 1.0
-				if (complexity_cand < complexity_target) and ((complexity_target - complexity_cand) >= self.params["complexity_drop_threshold"]):
-					simpler_candidates[c] = { "complexity_drop" : complexity_target - complexity_cand }
-			if len(simpler_candidates) == 0:
-				return None
-
-			context_vecs = self.get_context_vectors(tokens, index)
-			self.compute_features(tokens, index, tvec, simpler_candidates, context_vecs)
-			feats = ["sim", "complexity_drop"] if len(context_vecs) == 0 else ["sim", "complexity_drop", "context"]
-			ranks = {}
-			for c in simpler_candidates:
-				ranks[c] = []
-			for f in feats:
-				feat_sorted = sorted({c : simpler_candidates[c][f] for c in simpler_candidates}.items(), key=lambda x:x[1])
-				for fs in feat_sorted:
-					ranks[fs[0]].append(feat_sorted.index(fs))
-
-			ranked_candidates = sorted({c : sum(ranks[c]) for c in ranks}.items(), key=lambda x:x[1])
-			best_candidate = ranked_candidates[-1][0]
-			if simpler_candidates[best_candidate]["sim"] >= self.params["similarity_threshold"]:
-				return best_candidate
+	def count_skipped(self, text, indices, eligible):
+		"""Records the numbers of tokens not considered for simplification, by the (first) reason (except for the missing vectors)."""
+		names = text.names[indices]
+		simple = ~names & (text.complexities[indices] <= self.params["complexity_threshold"])
+		self.statistics.count("tokens", len(indices))
+		self.statistics.count("targets", int(eligible.sum()))
+		self.statistics.count("skipped_name_or_number", int(names.sum()))
+		self.statistics.count("skipped_low_complexity", int(simple.sum()))
+		self.statistics.count("skipped_stopword", int((~names & ~simple & text.stopwords[indices]).sum()))
+
+	def get_simpler_candidates(self, targets):
+		"""
+		Context-independent part of the simplification: for each (target word, complexity, vector) triple, finds the simpler candidate 
+		replacements and their "sim" and "complexity_drop" features (from the cache or the precomputed lexicon, if given). The candidates
+		of each distinct target word are computed once; the returned dictionaries are shared between its occurrences (and the cache). 
+		"""
+		keys = [(t[0], self.params["num_cand"], self.params["complexity_drop_threshold"]) for t in targets]
+		misses = {}
+		hits = 0
+		for k, t in zip(keys, targets):
+			if k in self.candidate_cache:
+				self.candidate_cache.move_to_end(k)
+				hits += 1
+			elif k not in misses:
+				misses[k] = t
 			else: 
-				return None
-		else:
-			return None
+				hits += 1
+		# the lookups of simplifiers with overridden parameters are counted by the simplifier they were created from
+		counter = self if self.parent is None else self.parent
+		counter.cache_hits += hits
+		counter.cache_misses += len(misses)
+
+		computed = dict(zip(misses, self.compute_simpler_candidates(list(misses.values()))))
+		simpler_candidates = [computed[k] if k in computed else self.candidate_cache[k] for k in keys]
+		if self.cache_size <= 0:
+			return simpler_candidates
+		for k in computed:
+			self.candidate_cache[k] = computed[k]
+			if len(self.candidate_cache) > self.cache_size:
+				self.candidate_cache.popitem(last = False)
+		return simpler_candidates
+
+	def compute_simpler_candidates(self, targets):
+		stats = self.statistics
+		if stats is not None:
+			start = time.perf_counter()
+		if self.lexicon is not None:
+			simpler_candidates = [self.lexicon.get_candidates(t[0] if t[0] in self.lexicon else t[0].lower(), self.params["complexity_drop_threshold"]) for t in targets]
+			if stats is not None:
+				stats.add_time("candidate_search", time.perf_counter() - start)
+			return simpler_candidates
+		if len(targets) == 0:
+			return []
+		# one batched neighbour search for all the targets
+		neighbours = self.embeddings.most_similar_fast_cosine_batch(np.array([t[2] for t in targets]), self.lang, num = self.params["num_cand"], without_first = True)
+		if stats is not None:
+			stats.add_time("candidate_search", time.perf_counter() - start)
+			start = time.perf_counter()
+		simpler_candidates = []
+		for t, cands in zip(targets, neighbours):
+			simpler = self.filter_candidates(t[0], t[1], cands)
+			if len(simpler) > 0:
+				for c, sim in zip(simpler, np.dot(self.embeddings.get_vectors(self.lang, list(simpler)), t[2])):
+					simpler[c]["sim"] = sim
+			simpler_candidates.append(simpler)
+		if stats is not None:
+			stats.add_time("candidate_filtering", time.perf_counter() - start)
+		return simpler_candidates
+
+	def cache_statistics(self):
+		if self.parent is not None:
+			return self.parent.cache_statistics()
+		lookups = self.cache_hits + self.cache_misses
+		return { "size" : len(self.candidate_cache), "hits" : self.cache_hits, "misses" : self.cache_misses, "hit_rate" : (self.cache_hits / lookups) if lookups > 0 else 0.0 }
+
+	def filter_candidates(self, target, complexity_target, candidates):
+		simpler_candidates = {}
+		# we discard candidates that are derivational morphological variations of the target word
+		for c in string_helper.filter_morphological_variants(target, candidates):
+			# don't allow the target word to be replaced by a stopword
+			if self.stopwords is not None and c.lower() in self.stopwords:
+				continue
+
+			complexity_cand = self.complexities.get(c)
+			if (complexity_cand < complexity_target) and ((complexity_target - complexity_cand) >= self.params["complexity_drop_threshold"]):
+				simpler_candidates[c] = { "complexity_drop" : complexity_target - complexity_cand }
+		return simpler_candidates
+
+	def choose_candidate(self, text, index, simpler_candidates):
+		return self.choose_candidates([text], [(0, index)], [simpler_candidates])[0]
+
+	def choose_candidates(self, texts, positions, simpler_candidates):
+		"""
+		Chooses the replacements (None if there is none) of the target occurrences, given as (text number, token index) positions in the (interned) texts.
+		All occurrences of the same target word share the candidates, which are ranked for all of them at once.
+		"""
+		choices = [None] * len(positions)
+		groups = {}
+		for o in range(len(positions)):
+			if simpler_candidates[o]:
+				t, i = positions[o]
+				groups.setdefault(texts[t].forms[i], []).append(o)
+
+		for occurrences in groups.values():
+			cands = simpler_candidates[occurrences[0]]
+			candidates = list(cands)
+			features = np.array([[cands[c][f] for c in candidates] for f in ["sim", "complexity_drop"]])
+			contexts = [self.get_context_vectors(texts[positions[o][0]], positions[o][1]) for o in occurrences]
+			with_context = np.array([len(c) > 0 for c in contexts])
+			best = np.empty(len(occurrences), dtype = np.int64)
+			if not with_context.all():
+				best[~with_context] = self.rank_candidates(features)
+			if with_context.any():
+				context = self.compute_context_features(self.embeddings.get_vectors(self.lang, candidates), [c for c in contexts if len(c) > 0])
+				best[with_context] = self.rank_candidates(np.concatenate((np.broadcast_to(features, (len(context),) + features.shape), context[:, np.newaxis, :]), axis = 1))
+			for o, b in zip(occurrences, best):
+				if cands[candidates[b]]["sim"] >= self.params["similarity_threshold"]:
+					choices[o] = candidates[b]
+
+		if self.statistics is not None:
+			chosen = sum(1 for c in choices if c is not None)
+			with_candidates = sum(len(occurrences) for occurrences in groups.values())
+			self.statistics.count("substitutions", chosen)
+			self.statistics.count("skipped_no_simpler_candidate", len(positions) - with_candidates)
+			self.statistics.count("skipped_below_similarity_threshold", with_candidates - chosen)
+		return choices
+
+	def rank_candidates(self, features):
+		"""
+		Given the (num. features x num. candidates) matrix, ranks the candidates according to each feature (the lowest value gets the rank 0) 
+		and returns the index of the candidate with the largest sum of ranks (the last one among the tied ones). For a stack of such matrices
+		(one per occurrence), returns the array of indices.
+		"""
+		ranks = np.empty(features.shape, dtype = np.int64)
+		np.put_along_axis(ranks, np.argsort(features, axis = -1, kind = 'stable'), np.arange(features.shape[-1]), axis = -1)
+		return np.argsort(ranks.sum(axis = -2), kind = 'stable')[..., -1]
 	
+	def compute_context_features(self, candidate_vecs, contexts, max_block_elements = TOP_K_BLOCK_ELEMENTS):
+		"""
+		The "context" features (sums of the similarities with the context vectors) of the candidates for several occurrences, given by their matrices
+		of context vectors, as an (occurrences x candidates) matrix. The context vectors of consecutive occurrences are multiplied in one block.
+		"""
+		lengths = np.array([len(c) for c in contexts], dtype = np.int64)
+		features = np.zeros((len(contexts), len(candidate_vecs)), dtype = np.float64)
+		block_rows = max(1, max_block_elements // max(1, len(candidate_vecs)))
+		start = 0
+		while start < len(contexts):
+			end = start + 1
+			rows = lengths[start]
+			while end < len(contexts) and rows + lengths[end] <= block_rows:
+				rows += lengths[end]
+				end += 1
+			nonempty = np.flatnonzero(lengths[start : end] > 0) + start
+			if len(nonempty) > 0:
+				scores = np.dot(candidate_vecs, np.transpose(np.concatenate([contexts[o] for o in nonempty]))).astype(np.float64)
+				offsets = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+				features[nonempty] = np.transpose(np.add.reduceat(scores, offsets, axis = 1))
+			start = end
+		return features
+
 	def compute_features(self, tokens, index, tvec, candidates, context_vecs):
-		for c in candidates:
-			candidates[c]["sim"] = np.dot(self.embeddings.get_vector(self.lang, c), tvec) 
-			if len(context_vecs) > 0:
-				csim = 0.0
-				for cv in context_vecs:
-					csim += np.dot(self.embeddings.get_vector(self.lang, c), cv)
-				candidates[c]["context"] = csim
-
-	def get_context_vectors(self, tokens, index):
+		"""Adds the "sim" (and, given context vectors, "context") features to the candidates of a single target word (choose_candidates computes them in batches)."""
+		if len(candidates) == 0:
+			return
+		vecs = self.embeddings.get_vectors(self.lang, list(candidates))
+		sims = np.dot(vecs, tvec)
+		context = np.dot(vecs, np.sum(context_vecs, axis = 0)) if len(context_vecs) > 0 else None
+		for i, c in enumerate(candidates):
+			candidates[c]["sim"] = sims[i]
+			if context is not None:
+				candidates[c]["context"] = context[i]
+
+	def get_context_vectors(self, text, index):
+		"""Vectors of the words (with embeddings) in the window around the token of the text (interned or a list of tokens), as a matrix."""
+		if not isinstance(text, InternedText):
+			text = self.intern_tokens(text)
 		window_size = self.params["context_window_size"]
 		start = index - window_size if (index - window_size >= 0) else 0
-		end = index + window_size if (index + window_size <= len(tokens)) else len(tokens)
-		cvecs = []
-		for i in range(start, end):
-			if i != index:
-				cword = self.fix_token(tokens[i])
-				cvec = self.embeddings.get_vector(self.lang, cword)
-				if cvec is None:
-					cvec = self.embeddings.get_vector(self.lang, cword.lower())
-				if cvec is not None:
-					cvecs.append(cvec)
-		return cvecs
-	
\ No newline at end of file
+		end = index + window_size if (index + window_size <= len(text)) else len(text)
+		rows = np.concatenate((text.ids[start : index], text.ids[index + 1 : end]))
+		return self.embeddings.get_rows(self.lang, rows[rows >= 0])
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from simplification import lightls
+
+class InvalidRequest(Exception):
+	"""A request which cannot be served as given (answered with 400 Bad Request), e.g., with parameters incompatible with the lexicon of the language."""
+	pass
+
+class SimplificationService(object):
+	"""
+	Long-running simplification server (HTTP over TCP or a Unix socket), keeping the simplifiers (embeddings, complexities, caches) of one or more
+	languages (languages.LanguageModels) loaded. Queued requests with the same language and parameters are simplified together, with one
+	batched search for candidates.
+	"""
+
+	# parameters which can be overridden per request, with their types
+	parameter_types = { "complexity_threshold" : float, "similarity_threshold" : float, "complexity_drop_threshold" : float, "num_cand" : int, "context_window_size" : int }
+	# their valid (closed) ranges, None for no upper bound
+	parameter_ranges = { "complexity_threshold" : (0.0, 1.0), "similarity_threshold" : (0.0, 1.0), "complexity_drop_threshold" : (0.0, 1.0), "num_cand" : (1, None), "context_window_size" : (1, None) }
+
+	def __init__(self, models, max_batch_texts = 256, max_batch_delay = 0.005, max_pending = 1024):
+		self.models = models
+		self.max_batch_texts = max_batch_texts
+		self.max_batch_delay = max_batch_delay
+		self.max_pending = max_pending
+		self.queue = None
+		self.pending = 0
+		# the simplifiers are not thread-safe: batches are processed (and the models of the languages loaded) one at a time, outside of the event loop
+		self.executor = ThreadPoolExecutor(max_workers = 1)
+		self.stats = { "requests" : 0, "texts" : 0, "batches" : 0, "rejected" : 0, "failed" : 0 }
+		self.start_time = time.time()
+
+	def simplify_batch(self, key, texts):
+		language, parameters = key
+		simplifier = self.models.get(language)
+		if len(parameters) > 0:
+			try:
+				simplifier = self.models.get(language, parameters)
+			except ValueError as e:
+				# the parameters are checked against the model of the language (e.g., against its lexicon) only once it is loaded
+				raise InvalidRequest(str(e))
+		return simplifier.simplify_batch(texts)
+
+	def parse_language(self, language):
+		if language is None:
+			return self.models.default_language()
+		if language not in self.models.languages():
+			raise ValueError("Unknown language: " + str(language))
+		return language
+
+	def parse_parameters(self, parameters):
+		if not isinstance(parameters, dict):
+			raise ValueError("Parameters need to be given as a JSON object")
+		unknown = [p for p in parameters if p not in self.parameter_types]
+		if len(unknown) > 0:
+			raise ValueError("Unknown parameters: " + ", ".join(unknown))
+		parsed = []
+		for p in sorted(parameters):
+			if isinstance(parameters[p], bool) or not isinstance(parameters[p], (int, float)) or (self.parameter_types[p] == int and not float(parameters[p]).is_integer()):
+				raise ValueError("Parameter " + p + " needs to be " + ("an integer" if self.parameter_types[p] == int else "a number"))
+			value = self.parameter_types[p](parameters[p])
+			low, high = self.parameter_ranges[p]
+			if not (value >= low and (high is None or value <= high)):
+				raise ValueError("Parameter " + p + " needs to be " + ("between " + str(low) + " and " + str(high) if high is not None else "at least " + str(low)) + ", not " + str(parameters[p]))
+			parsed.append((p, value))
+		return tuple(parsed)
+
+	async def batch_loop(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			batch = [await self.queue.get()]
+			num_texts = len(batch[0][1])
+			deadline = loop.time() + self.max_batch_delay
+			while num_texts < self.max_batch_texts:
+				timeout = deadline - loop.time()
+				if timeout <= 0:
+					break
+				try:
+					item = await asyncio.wait_for(self.queue.get(), timeout)
+				except asyncio.TimeoutError:
+					break
+				batch.append(item)
+				num_texts += len(item[1])
+
+			groups = {}
+			for item in batch:
+				groups.setdefault(item[0], []).append(item)
+			for key, items in groups.items():
+				texts = [t for item in items for t in item[1]]
+				try:
+					results = await loop.run_in_executor(self.executor, self.simplify_batch, key, texts)
+				except Exception as e:
+					for item in items:
+						if not item[2].done():
+							item[2].set_exception(e)
+					continue
+				start = 0
+				for item in items:
+					if not item[2].done():
+						item[2].set_result(results[start : start + len(item[1])])
+					start += len(item[1])
+				self.stats["batches"] += 1
+
+	async def handle_request(self, method, path, body):
+		if path == "/health" and method == "GET":
+			health = { "status" : "ok", "pending" : self.pending, "uptime" : round(time.time() - self.start_time, 1), "languages" : self.models.status() }
+			health.update(self.stats)
+			if self.models.statistics is not None:
+				health["statistics"] = self.models.statistics.summary()
+			return "200 OK", health
+
+		if path == "/simplify" and method == "POST":
+			try:
+				request = json.loads(body.decode("utf8"))
+				texts = [request["text"]] if "text" in request else request["texts"]
+				if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+					raise ValueError("Texts need to be given as a list of strings")
+				key = (self.parse_language(request.get("language")), self.parse_parameters(request.get("parameters", {})))
+			except (ValueError, KeyError, TypeError, AttributeError) as e:
+				return "400 Bad Request", { "error" : str(e) }
+
+			if self.pending >= self.max_pending:
+				self.stats["rejected"] += 1
+				return "503 Service Unavailable", { "error" : "Too many pending requests" }
+
+			self.pending += 1
+			future = asyncio.get_running_loop().create_future()
+			await self.queue.put((key, texts, future))
+			try:
+				results = await future
+			except InvalidRequest as e:
+				return "400 Bad Request", { "error" : str(e) }
+			except Exception as e:
+				self.stats["failed"] += 1
+				return "500 Internal Server Error", { "error" : str(e) }
+			finally:
+				self.pending -= 1
+			self.stats["requests"] += 1
+			self.stats["texts"] += len(texts)
+			return "200 OK", { "results" : [{ "text" : r[0], "substitutions" : [dict(zip(lightls.SUBSTITUTION_FIELDS, s)) for s in r[1]] } for r in results] }
+
+		return "404 Not Found", { "error" : "Unknown endpoint: " + method + " " + path }
+
+	async def handle_connection(self, reader, writer):
+		try:
+			while True:
+				request_line = await reader.readline()
+				if not request_line:
+					break
+				headers = {}
+				while True:
+					line = await reader.readline()
+					if line in (b"\r\n", b"\n", b""):
+						break
+					name, _, value = line.decode("latin-1").partition(":")
+					headers[name.strip().lower()] = value.strip()
+
+				parts = request_line.decode("latin-1").split()
+				if len(parts) != 3:
+					status, response, keep_alive = "400 Bad Request", { "error" : "Malformed request line" }, False
+				else:
+					body = await reader.readexactly(int(headers.get("content-length", "0")))
+					status, response = await self.handle_request(parts[0], parts[1].split("?")[0], body)
+					keep_alive = parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+				payload = json.dumps(response, ensure_ascii = False).encode("utf8")
+				head = "HTTP/1.1 " + status + "\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: " + str(len(payload)) + "\r\nConnection: " + ("keep-alive" if keep_alive else "close") + "\r\n\r\n"
+				writer.write(head.encode("latin-1") + payload)
+				await writer.drain()
+				if not keep_alive:
+					break
+		except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+			pass
+		finally:
+			writer.close()
+
+	async def serve(self, host = "127.0.0.1", port = 8080, socket_path = None):
+		self.queue = asyncio.Queue()
+		batcher = asyncio.ensure_future(self.batch_loop())
+		if socket_path is not None:
+			server = await asyncio.start_unix_server(self.handle_connection, path = socket_path)
+			print("Serving on Unix socket " + socket_path, flush = True)
+		else:
+			server = await asyncio.start_server(self.handle_connection, host, port)
+			print("Serving on http://" + host + ":" + str(port), flush = True)
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			batcher.cancel()
+
+	def run(self, host = "127.0.0.1", port = 8080, socket_path = None):
+		asyncio.run(self.serve(host = host, port = port, socket_path = socket_path))
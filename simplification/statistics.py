@@ -0,0 +1,57 @@
+import json
+import time
+
+class RunStatistics(object):
+	"""
+	Counters and cumulative timers (in seconds) of the stages of a simplification run. The simplifier (and the embeddings) record into it only when
+	one is attached to them (attribute statistics), otherwise the instrumentation is skipped. The summary is stored as JSON or passed to a callback.
+	Sub-stages are named after their stage (e.g., candidate_search.ann is a part of candidate_search) and are not counted in the total time.
+	"""
+
+	# reasons for which a token is not simplified, in the order in which they are checked
+	skip_reasons = ["name_or_number", "low_complexity", "stopword", "oov", "no_simpler_candidate", "below_similarity_threshold"]
+
+	def __init__(self, callback = None):
+		self.counters = {}
+		self.timers = {}
+		self.callback = callback
+		self.start_time = time.time()
+
+	def count(self, name, value = 1):
+		self.counters[name] = self.counters.get(name, 0) + value
+
+	def add_time(self, stage, seconds):
+		self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+
+	def merge(self, other):
+		"""Adds the counters and timers of another RunStatistics (e.g., of a worker process) or of its dictionary form."""
+		other = other.to_dict() if isinstance(other, RunStatistics) else other
+		for name, value in other["counters"].items():
+			self.count(name, value)
+		for stage, seconds in other["timers"].items():
+			self.add_time(stage, seconds)
+
+	def to_dict(self):
+		return { "counters" : dict(self.counters), "timers" : dict(self.timers) }
+
+	def summary(self, extra = None):
+		summary = { "elapsed" : round(time.time() - self.start_time, 3), "counters" : dict(self.counters), "timers" : {s : round(t, 4) for s, t in self.timers.items()} }
+		summary["stages_total"] = round(sum(t for s, t in self.timers.items() if "." not in s), 4)
+		summary["skipped"] = {r : self.counters.get("skipped_" + r, 0) for r in self.skip_reasons}
+		if self.counters.get("tokens", 0) > 0 and summary["elapsed"] > 0:
+			summary["tokens_per_sec"] = round(self.counters["tokens"] / summary["elapsed"], 1)
+		if extra is not None:
+			summary.update(extra)
+		return summary
+
+	def report(self, extra = None):
+		summary = self.summary(extra)
+		if self.callback is not None:
+			self.callback(summary)
+		return summary
+
+	def store(self, path, extra = None):
+		summary = self.report(extra)
+		with open(path, "w", encoding = "utf8") as f:
+			json.dump(summary, f, indent = 2)
+		return summary
@@ -0,0 +1,23 @@
+import numpy as np
+
+def select_vocabulary(complexities, stopwords, complexity_threshold, max_targets = 100000, max_candidates = 30000, max_context = 50000):
+	"""
+	Selects the words of the frequency list (ComplexityTable) worth keeping in the embedding space, with a separate budget for each role a word can play:
+	targets (words more complex than the threshold, the most frequent ones first, as they are the most likely to appear in texts), 
+	candidates (the most frequent, i.e., simplest, non-stopwords) and context words (the most frequent words, including stopwords).
+	"""
+	stopwords = set(stopwords) if stopwords else set()
+	order = np.argsort(-complexities.frequencies, kind = 'stable')
+	by_frequency = [complexities.words[i] for i in order]
+	is_complex = complexities.complexities[order] > complexity_threshold
+
+	candidates = [w for w in by_frequency if w.lower() not in stopwords][:max_candidates]
+	targets = [w for w, c in zip(by_frequency, is_complex) if c and w.lower() not in stopwords][:max_targets]
+	context = by_frequency[:max_context]
+	return set(candidates).union(targets).union(context)
+
+def frequency_coverage(complexities, vocabulary):
+	"""Share of the corpus tokens (according to the frequency list) covered by the vocabulary."""
+	total = complexities.frequencies.sum()
+	ids = complexities.get_ids(list(vocabulary))
+	return complexities.frequencies[ids[ids >= 0]].sum() / float(total) if total > 0 else 0.0
@@ -1,65 +1,182 @@
 from simplification import lightls
+from simplification import complexity
+from simplification import lexicon
+from simplification import vocabulary
+from simplification import corpus
+from simplification import statistics
+from simplification import dedup
 from helpers import io_helper
 from embeddings import text_embeddings
+from embeddings import ann_index
 import argparse
 import os
+import sys
 from datetime import datetime
 
 parser = argparse.ArgumentParser(description='A light-weight language-agnostic tool for lexical text simplification.')
-parser.add_argument('datadir', help='Path to the directory containing the files with texts to be simplified.')
-parser.add_argument('outdir', help='Path to directory in which the lexically simplified texts are to be stored (together with the files containing the lists of substitutions made).')
-parser.add_argument('wordfreqs', help='Path to the file containing the precomputed word frequencies in a large corpus (one pair word-frequency per line, word whitespace separated from its frequency).')
-parser.add_argument('embs', help='Path to the file containing pre-trained word embeddings')
+parser.add_argument('datadir', help='Path to the directory containing the files with texts to be simplified. Alternatively, a path to a single (arbitrarily large) file or "-" for the standard input, which are read in a streaming fashion (see the option -f).')
+parser.add_argument('outdir', help='Path to directory in which the lexically simplified texts are to be stored (together with the files containing the lists of substitutions made), or "-" for writing the simplified texts to the standard output.')
+parser.add_argument('wordfreqs', help='Path to the file containing the precomputed word frequencies in a large corpus (one pair word-frequency per line, word whitespace separated from its frequency), or the binary complexity table produced by convert_wordfreqs.py.')
+parser.add_argument('embs', nargs='?', help='Path to the file containing pre-trained word embeddings (textual format or binary format produced by convert_embeddings.py). Not needed when simplifying with a precomputed substitution lexicon (option -lex).')
 parser.add_argument('-s', '--stopwords', help='Path to the file containing the list of stopwords for the source language.')
 parser.add_argument('-tc', '--tholdcmplx', type=float, help='The minimal complexity of the word needed to consider replacing it with a simpler word. The value needs to be between 0.0 (all words are considered for simplification) and 1.0 (no words are considered for simplification, texts will not be changed), default = 0.2', default = 0.2)
 parser.add_argument('-nc', '--numcands', type=int, help='Number of candidate replacement words to consider, for source words with complexity above the -tc value (default 10)', default = 10)
 parser.add_argument('-st', '--tholdsim', type=float, help='The minimal cosine similarity between the embeddings of the original word and the candidate replacement word required for replacement. The value needs to be between 0.0 (the best candidate replacement will always replace the original word) and 1.0 (the best candidate replacement will never replace the original word, texts will not be changed), default = 0.55', default=0.55)
 parser.add_argument('-cd', '--dropcmplx', type=float, help='The minimal drop in complexity that would be achieved by replacing the source text word with a replacement candidate. Recommended values are between between 0.0 (any complexity reduction is good enough) and 0.1 (the replacement word must be at least 10 percent simpler), default = 0.03', default=0.03)
+parser.add_argument('-l', '--limit', type=int, help='Number of lines of the (textual) embeddings file to read, i.e., the size of the vocabulary (default 200000)', default = 200000)
+parser.add_argument('-ann', '--annindex', help='Path to the approximate nearest-neighbour index built with build_ann_index.py (if not provided, the exact search for candidates is performed)')
+parser.add_argument('-np', '--nprobe', type=int, help='Number of index lists searched for candidates when using the approximate nearest-neighbour index. Higher values give more accurate candidates at the expense of speed (default 8)', default = 8)
+parser.add_argument('-lex', '--lexicon', help='Path to the substitution lexicon precomputed with build_lexicon.py. With the lexicon, the full embedding space is not loaded.')
+parser.add_argument('-pr', '--prune', action='store_true', help='Keep in memory only the embeddings of the words from the frequency list which can be target words, candidate replacements or context words (see options -bt, -bc and -bx)')
+parser.add_argument('-bt', '--budgettargets', type=int, help='With pruning, the number of (most frequent) words more complex than the -tc threshold kept as potential target words (default 100000)', default = 100000)
+parser.add_argument('-bc', '--budgetcandidates', type=int, help='With pruning, the number of most frequent non-stopwords kept as potential candidate replacements (default 30000)', default = 30000)
+parser.add_argument('-bx', '--budgetcontext', type=int, help='With pruning, the number of most frequent words kept as potential context words (default 50000)', default = 50000)
+parser.add_argument('-q', '--quantize', choices = ['float16', 'int8'], help='Store the embeddings in memory in a compact form: float16 (half of the memory) or int8 with per-vector scales (roughly a quarter of the memory), default: float32 (no quantisation)')
+parser.add_argument('-cs', '--cachesize', type=int, help='Maximal number of target words whose candidate replacements are cached (the least recently used are evicted first), 0 disables the cache (default 100000)', default = 100000)
+parser.add_argument('-nw', '--workers', type=int, help='Number of worker processes simplifying the files (and parsing the chunks of textual embeddings) in parallel (default 1)', default = 1)
+parser.add_argument('-f', '--format', choices = ['lines', 'jsonl'], help='Format of the streamed input and output (i.e., when the input is a single file or the standard input, or the output is the standard output): one document per line (lines) or one JSON object with the field "text" per line (jsonl), default = lines', default = 'lines')
+parser.add_argument('-dd', '--dedup', choices = ['sentence', 'paragraph'], help='Split the texts into sentences (or paragraphs, separated by empty lines) and simplify each distinct one only once, reusing the result for its repetitions (the context of the simplified words is then limited to their sentence or paragraph)')
+parser.add_argument('-dm', '--dedupmax', type=int, help='With deduplication, the maximal number of distinct sentences (or paragraphs) whose simplifications are kept for reuse (default 100000)', default = 100000)
+parser.add_argument('-inc', '--incremental', action='store_true', help='Simplify only the input files which are new or changed since the previous run into the same output directory with the same settings (or which were not finished when the previous run was interrupted), using the manifest file ' + corpus.MANIFEST_NAME + ' in the output directory')
+parser.add_argument('-rs', '--runstats', help='Path to the JSON file into which the statistics of the run are written: time spent in each stage (target selection, candidate search, filtering, ranking, input/output), numbers of tokens not simplified by reason, cache hits and misses')
+parser.add_argument('-sf', '--subsformat', choices = ['tsv', 'jsonl'], help='Format of the files with the substitutions (.subs): tab-separated lines with the token index, the original word and the replacement (tsv), or one JSON object per substitution (jsonl) with the token index, the character offsets of the replacement in the simplified text, the original word, the replacement and its similarity and complexity drop, default = tsv', default = 'tsv')
+parser.add_argument('-gz', '--compress', action='store_true', help='Compress the output files (simplified texts and substitutions) with gzip, adding the suffix .gz to their names')
 parser.add_argument('-w', '--window', type=int, help='The size of the symmetric window around the original word considered for simplification defining the contextual words whose similarity with the replacement candidates is to be measured (contextual similarity features, default = 5)', default=5)
 	
 args = parser.parse_args()
 
-if not os.path.isdir(os.path.dirname(args.datadir)):
-	print("Error: Directory containing the input files not found.")
+if args.datadir != "-" and not os.path.exists(args.datadir):
+	print("Error: Directory (or file) containing the input texts not found.")
 	exit(code = 1)
 
-if not os.path.isdir(os.path.dirname(args.outdir)):
+if args.outdir != "-" and not os.path.isdir(os.path.dirname(args.outdir)):
 	print("Error: Output directory not found.")
 	exit(code = 1)
 
-if not os.path.isfile(args.embs):
+if args.lexicon and not os.path.isfile(args.lexicon):
+	print("Error: File containing the substitution lexicon not found.")
+	exit(code = 1)
+
+if not args.lexicon and (not args.embs or not os.path.isfile(args.embs)):
 	print("Error: File containing pre-trained word embeddings not found.")
 	exit(code = 1)
 
+if args.annindex and args.prune:
+	print("Error: The approximate nearest-neighbour index cannot be used with the pruned vocabulary.")
+	exit(code = 1)
+
+if args.annindex and not os.path.isfile(args.annindex):
+	print("Error: File containing the approximate nearest-neighbour index not found.")
+	exit(code = 1)
+
 if not os.path.isdir(os.path.dirname(args.wordfreqs)):
 	print("Error: File containing word frequencies (pre-computed from a large corpus) not found.")
 	exit(code = 1)
 
-print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Starting lexical simplification.", flush = True)
-files = io_helper.load_all_files(args.datadir)
-filenames = [x[0] for x in files]
-texts = [x[1] for x in files]
+streaming = args.datadir == "-" or args.outdir == "-" or os.path.isfile(args.datadir)
+if args.outdir == "-":
+	# the standard output is reserved for the simplified texts, progress messages go to the standard error
+	text_output = io_helper.open_text_output("-")
+	sys.stdout = sys.stderr
 
-t_embeddings = text_embeddings.Embeddings()
-t_embeddings.load_embeddings(args.embs, 200000, language = 'default', print_loading = True, skip_first_line = True, normalize = True)
-t_embeddings.inverse_vocabularies()
+if streaming and args.incremental:
+	print("Error: Incremental runs (option -inc) need an input directory and an output directory, not streamed input or output.")
+	exit(code = 1)
+if streaming and args.workers > 1:
+	print("Warning: Streamed texts are simplified in a single process; the worker processes (option -nw) are used only for parsing textual embeddings.")
+
+print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Starting lexical simplification.", flush = True)
 
 print("Loading unigram frequencies...")
-ls = io_helper.load_lines(args.wordfreqs)
-wfs = {x.split()[0].strip() : int(x.split()[1].strip()) for x in ls}
+complexities = complexity.ComplexityTable.load(args.wordfreqs)
+
+stopwords = io_helper.load_lines(args.stopwords) if args.stopwords else None
+
+vocabulary_filter = None
+if args.prune:
+	vocabulary_filter = vocabulary.select_vocabulary(complexities, stopwords, args.tholdcmplx, max_targets = args.budgettargets, max_candidates = args.budgetcandidates, max_context = args.budgetcontext)
+	print("Words selected for the pruned vocabulary: " + str(len(vocabulary_filter)))
+
+lex = None
+if args.lexicon:
+	print("Loading substitution lexicon...")
+	lex = lexicon.SubstitutionLexicon.load(args.lexicon)
+	t_embeddings = lex.to_embeddings('default')
+else:
+	t_embeddings = text_embeddings.Embeddings()
+	if io_helper.is_binary_embeddings(args.embs):
+		print("Loading binary embeddings...")
+		t_embeddings.load_embeddings_binary(args.embs, language = 'default', vocabulary_filter = vocabulary_filter, print_loading = True)
+	else:
+		t_embeddings.load_embeddings(args.embs, args.limit, language = 'default', print_loading = True, skip_first_line = True, normalize = True, vocabulary_filter = vocabulary_filter, num_workers = args.workers)
+	t_embeddings.inverse_vocabularies()
+	if args.prune:
+		print("Share of corpus tokens (according to the word frequencies) covered by the embeddings vocabulary: " + str(round(100 * vocabulary.frequency_coverage(complexities, t_embeddings.lang_vocabularies['default']), 2)) + "%")
+
+	if args.quantize:
+		memory_before = t_embeddings.memory_usage('default')
+		t_embeddings.quantize('default', args.quantize)
+		print("Embeddings quantised to " + args.quantize + ": " + str(round(memory_before / 1048576.0, 1)) + " MB -> " + str(round(t_embeddings.memory_usage('default') / 1048576.0, 1)) + " MB")
+	if args.annindex:
+		print("Loading approximate nearest-neighbour index...")
+		try:
+			t_embeddings.set_ann_index('default', ann_index.IVFIndex.load(args.annindex, nprobe = args.nprobe))
+		except ValueError as e:
+			print("Error: " + str(e))
+			exit(code = 1)
 
 parameters = {"complexity_drop_threshold" : args.dropcmplx, "num_cand" : args.numcands, "similarity_threshold" : args.tholdsim, "context_window_size" : args.window, "complexity_threshold" : args.tholdcmplx}
 print("Parameters: ")
 print(parameters)
 
-stopwords = io_helper.load_lines(args.stopwords) if args.stopwords else None
+run_stats = None
+if args.runstats:
+	run_stats = statistics.RunStatistics()
+	t_embeddings.statistics = run_stats
+
+deduplicator = dedup.UnitDeduplicator(args.dedup, max_units = args.dedupmax) if args.dedup else None
+simplifier = lightls.LightLS(t_embeddings, complexities, parameters, stopwords, lexicon = lex, cache_size = args.cachesize, statistics = run_stats, deduplicator = deduplicator)
+
+if streaming:
+	name = "stdin" if args.datadir == "-" else os.path.basename(os.path.normpath(args.datadir))
+	subs_output = None
+	if args.outdir != "-":
+		suffix = ".gz" if args.compress else ""
+		text_output = io_helper.open_text_output(os.path.join(args.outdir, name + suffix), compress = args.compress)
+		if args.format == "lines":
+			subs_output = io_helper.open_text_output(os.path.join(args.outdir, os.path.splitext(name)[0] + ".subs" + suffix), compress = args.compress)
+	print("Simplifying streamed texts from: " + name)
+	num_docs = corpus.simplify_stream(simplifier, corpus.iterate_documents(args.datadir, args.format), text_output, subs_output, data_format = args.format, subs_format = args.subsformat)
+	if args.outdir != "-":
+		text_output.close()
+	else:
+		text_output.flush()
+	if subs_output is not None:
+		subs_output.close()
+	print("Simplified texts: " + str(num_docs))
+else:
+	filepaths = [os.path.join(args.datadir, x) for x in os.listdir(args.datadir)]
+	manifest = None
+	if args.incremental:
+		# the settings which determine the outputs: parameters, model files and the options of loading them
+		model_files = {name : corpus.file_signature(path) for name, path in [("wordfreqs", args.wordfreqs), ("embs", args.embs), ("stopwords", args.stopwords), ("lexicon", args.lexicon), ("annindex", args.annindex)] if path}
+		options = { "subsformat" : args.subsformat, "compress" : args.compress, "dedup" : args.dedup, "limit" : args.limit, "nprobe" : args.nprobe, "quantize" : args.quantize, "prune" : [args.budgettargets, args.budgetcandidates, args.budgetcontext] if args.prune else None }
+		manifest = corpus.RunManifest(args.outdir, corpus.run_fingerprint({ "parameters" : parameters, "model" : model_files, "options" : options }), compress = args.compress)
+	corpus.simplify_files(simplifier, filepaths, args.outdir, num_workers = args.workers, manifest = manifest, subs_format = args.subsformat, compress = args.compress)
+
+if args.cachesize > 0:
+	cache_stats = simplifier.cache_statistics()
+	print("Candidate cache: " + str(cache_stats["hits"]) + " hits, " + str(cache_stats["misses"]) + " misses (hit rate " + str(round(100 * cache_stats["hit_rate"], 2)) + "%)")
 
-simplifier = lightls.LightLS(t_embeddings, wfs, parameters, stopwords)
+if deduplicator is not None:
+	print("Deduplication: " + str(deduplicator.repeated) + " of " + str(deduplicator.units) + " " + args.dedup + "s were repetitions (dedup ratio " + str(round(100 * deduplicator.dedup_ratio(), 2)) + "%)")
 
-for i in range(len(filenames)):
-	print("Simplifying text in file: " + str(filenames[i]) + "(" + str(i+1) + "/" + str(len(filenames)) + ")")
-	simp_text, subs = simplifier.simplify_text(texts[i])	
-	io_helper.write_list(args.outdir + "/" + os.path.basename(filenames[i]), [simp_text])
-	io_helper.write_list_tuples_separated(args.outdir + "/" + os.path.splitext(os.path.basename(filenames[i]))[0] + ".subs", subs)
+if run_stats is not None:
+	extra = { "parameters" : parameters, "cache" : simplifier.cache_statistics() }
+	if deduplicator is not None:
+		extra["dedup"] = { "unit" : args.dedup, "units" : deduplicator.units, "repeated" : deduplicator.repeated, "ratio" : deduplicator.dedup_ratio() }
+	summary = run_stats.store(args.runstats, extra)
+	print("Run statistics: " + str(summary["counters"].get("tokens", 0)) + " tokens, " + str(summary["counters"].get("substitutions", 0)) + " substitutions; tokens not simplified: " + ", ".join(r + " " + str(n) for r, n in summary["skipped"].items()))
+	print("Time per stage (seconds): " + ", ".join(s + " " + str(t) for s, t in summary["timers"].items()) + "; total (without the sub-stages): " + str(summary["stages_total"]))
 
 print(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " Lexical simplification completed. I'm out of here, ciao bella!", flush = True)
\ No newline at end of file